@@ -6,23 +6,50 @@ Supports Static, 3D, and Animated tiers with versioning system
 """
 
 import requests
-import json
 import os
 import time
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
 import trafilatura
 import re
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Iterator, Optional, Tuple
 import hashlib
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from character_store import CharacterStore, character_key
+from name_index import NameIndex
+from http_transport import AsyncTransport, TransportResponse, read_prefix
+from http_cache import HttpCache
+from rate_limiter import HostRateLimiter, shared_limiter
+from resilience import Resilience, shared_resilience
+from html_extraction import Rule, extract
+from batch_scheduler import BatchCheckpoint, BatchScheduler, aiterate
+from perceptual_dedup import PerceptualDeduplicator, PerceptualHashIndex
+from image_probe import probe_image
+from quality_scoring import TierBuckets, rank_by_tier, score_image, score_images, score_url
+from image_store import ImageStore
+from image_record import ImageRecord, from_dicts, to_dicts
+from metrics import metrics
+from image_validation import ValidationCache, iter_validate, validate_batch, validate_top_k, validate_with_cache
 
 class AdvancedCharacterScraper:
-    def __init__(self):
+    # Streaming extraction rules for each page type (see html_extraction.Rule)
+    MUDAE_SEARCH_RULES = [Rule('links', 'a', {'href': re.compile(r'/characters/\d+')}, limit=3)]
+    MUDAE_PAGE_RULES = [Rule('images', 'img', {'src': True})]
+    ANIME_PLANET_RULES = [Rule('images', 'img', container=('div', {'class': 'character'}), first=True, limit=5)]
+    MAL_RULES = [Rule('images', 'img', container=('td', {'class': 'borderClass'}), first=True, limit=3)]
+    ZEROCHAN_SEARCH_RULES = [Rule('links', 'a', {'href': re.compile(r'/\d+')}, limit=8)]
+    ZEROCHAN_IMAGE_RULES = [Rule('image', 'img', {'id': 'large'}, limit=1)]
+    
+    def __init__(self, rate_limiter: Optional[HostRateLimiter] = None,
+                 transport: Optional[AsyncTransport] = None,
+                 resilience: Optional[Resilience] = None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        # Pooled async engine if given, otherwise the plain blocking session
+        self.http = transport or self.session
         
         # Image storage directories
         self.base_dir = Path("character_images")
@@ -35,7 +62,6 @@ class AdvancedCharacterScraper:
             dir_path.mkdir(parents=True, exist_ok=True)
             
         # Character database
-        self.character_db = {}
         self.load_character_db()
         
         # Image quality filters
@@ -44,22 +70,104 @@ class AdvancedCharacterScraper:
         self.valid_static_formats = ['.jpg', '.jpeg', '.png', '.webp']
         self.valid_animated_formats = ['.gif', '.webp']
         
+        # Batch validation settings
+        self.validation_workers = 8  # Concurrent HEAD requests
+        self.validation_time_budget = 60  # Seconds for a whole character
+        self.validation_cache = ValidationCache(
+            self.base_dir / "validation_cache.db", ttl=24 * 3600,
+            legacy_json=self.base_dir / "validation_cache.json"
+        )
+        self.images_per_tier = 250  # Card versions kept per tier
+        self.probe_score_boost = 4  # Probed resolution (+3) replacing a low-res URL guess (-1)
+        
+        # Per-host token buckets (shared with ImageCollector by default)
+        self.rate_limiter = rate_limiter or shared_limiter
+        # Retries and per-host / per-source circuit breakers (shared with ImageCollector by default)
+        self.resilience = resilience or shared_resilience
+        self.request_budget = None  # Global in-flight cap, set by BatchScheduler
+        self.checkpoint = None  # BatchCheckpoint of the running batch, if any
+        self.perceptual_dedup = None  # See enable_perceptual_dedup()
+        
+        # Optional local copies of validated images (records keep their URLs either way)
+        self.image_store = ImageStore(self.base_dir, max_file_size=self.max_file_size)
+        self.download_images = False  # Opt-in: set True to fill the image store
+        self.download_workers = 8
+        
+        # Search and character pages are re-used across runs (None disables)
+        self.http_cache = HttpCache(self.base_dir / "http_cache.db")
+        self.zerochan_page_workers = 4  # Zerochan detail pages fetched at once
+        
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET through the configured transport, rate limited per host, retried and circuit broken"""
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                return metrics.track_request('GET', url, lambda: self.http.get(url, **kwargs))
+        return self.resilience.request(url, attempt)
+    
+    def _get_page(self, url: str, params=None, **kwargs) -> requests.Response:
+        """GET a search / character page, served from the HTTP cache while fresh"""
+        if self.http_cache is None:
+            return self._get(url, params=params, **kwargs)
+        return self.http_cache.fetch(
+            url, lambda headers: self._get(url, params=params, headers=headers or None, **kwargs), params
+        )
+    
+    def _head(self, url: str, **kwargs) -> requests.Response:
+        """HEAD through the configured transport, rate limited per host, retried and circuit broken"""
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                return metrics.track_request('HEAD', url, lambda: self.http.head(url, **kwargs))
+        return self.resilience.request(url, attempt)
+    
+    def _get_range(self, url: str, length: int, timeout: float = 10, start: int = 0) -> TransportResponse:
+        """
+        Fetch only length bytes of url from offset start, rate limited, retried and circuit broken.
+        Streamed on the blocking session and cut off at length bytes, so a server
+        that ignores the Range and answers 200 does not send the whole image.
+        """
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                response = metrics.track_request('GET', url, lambda: self.session.get(
+                    url, headers={'Range': f'bytes={start}-{start + length - 1}'}, stream=True, timeout=timeout),
+                    read_body=False)
+                response = read_prefix(response, length)
+            metrics.inc('http_response_bytes_total', len(response.content), host=urlparse(url).hostname or '')
+            return response
+        return self.resilience.request(url, attempt)
+    
+    def _open_stream(self, url: str, headers: Dict) -> requests.Response:
+        """Streaming GET for downloads (always the blocking session; bodies are read in chunks)"""
+        self.rate_limiter.acquire(url)
+        return metrics.track_request('GET', url, lambda: self.session.get(
+            url, headers=headers, stream=True, timeout=30), read_body=False)
+    
+    def enable_perceptual_dedup(self, threshold: int = 6) -> bool:
+        """Turn on content-aware deduplication (needs Pillow)"""
+        try:
+            index = PerceptualHashIndex(self.base_dir / "image_hashes.jsonl", threshold=threshold)
+            self.perceptual_dedup = PerceptualDeduplicator(index, self._get_range, max_bytes=self.max_file_size)
+            return True
+        except ImportError as e:
+            print(f"Perceptual dedup unavailable: {e}")
+            return False
+    
     def load_character_db(self):
-        """Load existing character database"""
-        db_path = self.base_dir / "character_database.json"
-        if db_path.exists():
-            with open(db_path, 'r', encoding='utf-8') as f:
-                self.character_db = json.load(f)
-        else:
-            self.character_db = {}
+        """Open the character database (imports character_database.json on first run)"""
+        self.character_db = CharacterStore(
+            self.base_dir / "character_database.db",
+            legacy_json=self.base_dir / "character_database.json"
+        )
     
     def save_character_db(self):
-        """Save character database to file"""
-        db_path = self.base_dir / "character_database.json"
-        with open(db_path, 'w', encoding='utf-8') as f:
-            json.dump(self.character_db, f, indent=2, ensure_ascii=False)
+        """Export character database to character_database.json and the card service snapshot"""
+        # Records are persisted as they are assigned; this is only for JSON and snapshot consumers
+        self.character_db.export_json(self.base_dir / "character_database.json")
+        self.character_db.export_snapshot(self.base_dir / "character_database.snap")
     
-    def scrape_mudae_character_images(self, character_name: str, series: str) -> List[Dict]:
+    def scrape_mudae_character_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """
         Scrape character images from Mudae website
         Returns list of image data with URLs, types, and metadata
@@ -82,14 +190,12 @@ class AdvancedCharacterScraper:
                     'type': 'character'
                 }
                 
-                response = self.session.get(search_url, params=search_params, timeout=10)
+                response = self._get_page(search_url, params=search_params, timeout=10)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    # Find character page links
-                    character_links = soup.find_all('a', href=re.compile(r'/characters/\d+'))
+                    # Find character page links (first 3 results)
+                    character_links = extract(response.content, self.MUDAE_SEARCH_RULES)['links']
                     
-                    for link in character_links[:3]:  # Check first 3 results
+                    for link in character_links:
                         char_url = urljoin("https://mudae.net", link['href'])
                         char_images = self.scrape_mudae_character_page(char_url)
                         images.extend(char_images)
@@ -106,19 +212,17 @@ class AdvancedCharacterScraper:
         
         return images
     
-    def scrape_mudae_character_page(self, char_url: str) -> List[Dict]:
+    def scrape_mudae_character_page(self, char_url: str) -> List[ImageRecord]:
         """Scrape images from individual Mudae character page"""
         images = []
         
         try:
-            response = self.session.get(char_url, timeout=10)
+            response = self._get_page(char_url, timeout=10)
             if response.status_code != 200:
                 return images
                 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
             # Find image elements
-            img_elements = soup.find_all('img', src=True)
+            img_elements = extract(response.content, self.MUDAE_PAGE_RULES)['images']
             
             for img in img_elements:
                 img_url = img['src']
@@ -136,14 +240,11 @@ class AdvancedCharacterScraper:
                     rarity_tier = "animated"
                 
                 # Get image metadata
-                img_data = {
-                    'url': img_url,
-                    'tier': rarity_tier,
-                    'source': 'mudae',
-                    'quality_score': self.calculate_quality_score(img_url),
-                    'alt_text': img.get('alt', ''),
-                    'page_url': char_url
-                }
+                img_data = ImageRecord(
+                    img_url, rarity_tier, 'mudae', 0,  # Scored per source in _run_source
+                    alt_text=img.get('alt', ''),
+                    page_url=char_url
+                )
                 
                 images.append(img_data)
         
@@ -152,7 +253,7 @@ class AdvancedCharacterScraper:
         
         return images
     
-    def scrape_anime_planet_images(self, character_name: str, series: str) -> List[Dict]:
+    def scrape_anime_planet_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """Scrape character images from Anime-Planet"""
         images = []
         
@@ -164,16 +265,11 @@ class AdvancedCharacterScraper:
                 'include_tags': series
             }
             
-            response = self.session.get(search_url, params=search_params, timeout=10)
+            response = self._get_page(search_url, params=search_params, timeout=10)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Find character cards
-                char_cards = soup.find_all('div', class_='character')
-                
-                for card in char_cards[:5]:  # First 5 results
-                    img_elem = card.find('img')
-                    if img_elem and img_elem.get('src'):
+                # First image of each character card (first 5 results)
+                for img_elem in extract(response.content, self.ANIME_PLANET_RULES)['images']:
+                    if img_elem.get('src'):
                         img_url = img_elem['src']
                         
                         if img_url.startswith('//'):
@@ -181,14 +277,11 @@ class AdvancedCharacterScraper:
                         elif img_url.startswith('/'):
                             img_url = 'https://www.anime-planet.com' + img_url
                         
-                        img_data = {
-                            'url': img_url,
-                            'tier': 'static',
-                            'source': 'anime-planet',
-                            'quality_score': self.calculate_quality_score(img_url),
-                            'alt_text': img_elem.get('alt', ''),
-                            'page_url': response.url
-                        }
+                        img_data = ImageRecord(
+                            img_url, 'static', 'anime-planet', 0,
+                            alt_text=img_elem.get('alt', ''),
+                            page_url=response.url
+                        )
                         
                         images.append(img_data)
         
@@ -197,7 +290,7 @@ class AdvancedCharacterScraper:
         
         return images
     
-    def scrape_myanimelist_images(self, character_name: str, series: str) -> List[Dict]:
+    def scrape_myanimelist_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """Scrape character images from MyAnimeList"""
         images = []
         
@@ -209,27 +302,19 @@ class AdvancedCharacterScraper:
                 'cat': 'character'
             }
             
-            response = self.session.get(search_url, params=search_params, timeout=10)
+            response = self._get_page(search_url, params=search_params, timeout=10)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Find character results
-                char_results = soup.find_all('td', class_='borderClass')
-                
-                for result in char_results[:3]:
-                    img_elem = result.find('img')
-                    if img_elem and img_elem.get('data-src'):
+                # First image of each character result (first 3 results)
+                for img_elem in extract(response.content, self.MAL_RULES)['images']:
+                    if img_elem.get('data-src'):
                         img_url = img_elem['data-src']
                         
                         # MAL images are high quality
-                        img_data = {
-                            'url': img_url,
-                            'tier': 'static',
-                            'source': 'myanimelist',
-                            'quality_score': self.calculate_quality_score(img_url) + 2,  # Bonus for MAL quality
-                            'alt_text': img_elem.get('alt', ''),
-                            'page_url': response.url
-                        }
+                        img_data = ImageRecord(
+                            img_url, 'static', 'myanimelist', 0,  # MAL bonus: SOURCE_BONUS
+                            alt_text=img_elem.get('alt', ''),
+                            page_url=response.url
+                        )
                         
                         images.append(img_data)
         
@@ -238,7 +323,7 @@ class AdvancedCharacterScraper:
         
         return images
     
-    def scrape_zerochan_images(self, character_name: str, series: str) -> List[Dict]:
+    def scrape_zerochan_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """Scrape high-quality images from Zerochan"""
         images = []
         
@@ -250,42 +335,42 @@ class AdvancedCharacterScraper:
                 'o': 'popular'  # Sort by popularity
             }
             
-            response = self.session.get(search_url, params=search_params, timeout=10)
+            response = self._get_page(search_url, params=search_params, timeout=10)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
+                # Find image thumbnails (first 8 results)
+                thumb_links = extract(response.content, self.ZEROCHAN_SEARCH_RULES)['links']
+                page_urls = [urljoin("https://www.zerochan.net", link['href']) for link in thumb_links]
                 
-                # Find image thumbnails
-                thumb_links = soup.find_all('a', href=re.compile(r'/\d+'))
+                # Get full images from the individual pages, a few at a time
+                with ThreadPoolExecutor(max_workers=self.zerochan_page_workers) as executor:
+                    full_images = list(executor.map(self.scrape_zerochan_full_image, page_urls))
                 
-                for link in thumb_links[:8]:  # First 8 results
-                    img_page_url = urljoin("https://www.zerochan.net", link['href'])
-                    
-                    # Get full image from individual page
-                    img_response = self.session.get(img_page_url, timeout=10)
-                    if img_response.status_code == 200:
-                        img_soup = BeautifulSoup(img_response.content, 'html.parser')
-                        full_img = img_soup.find('img', id='large')
+                for img_page_url, full_img in zip(page_urls, full_images):
+                    if full_img and full_img.get('src'):
+                        img_url = full_img['src']
+                        
+                        img_data = ImageRecord(
+                            img_url, 'static', 'zerochan', 0,  # Zerochan bonus: SOURCE_BONUS
+                            alt_text=full_img.get('alt', ''),
+                            page_url=img_page_url
+                        )
                         
-                        if full_img and full_img.get('src'):
-                            img_url = full_img['src']
-                            
-                            img_data = {
-                                'url': img_url,
-                                'tier': 'static',
-                                'source': 'zerochan',
-                                'quality_score': self.calculate_quality_score(img_url) + 1,  # Bonus for Zerochan quality
-                                'alt_text': full_img.get('alt', ''),
-                                'page_url': img_page_url
-                            }
-                            
-                            images.append(img_data)
+                        images.append(img_data)
         
         except Exception as e:
             print(f"Error scraping Zerochan for {character_name}: {e}")
         
         return images
     
-    def scrape_tenor_gifs(self, character_name: str, series: str) -> List[Dict]:
+    def scrape_zerochan_full_image(self, img_page_url: str) -> Optional[Dict]:
+        """Full-size image element of a Zerochan post page"""
+        img_response = self._get_page(img_page_url, timeout=10)
+        if img_response.status_code != 200:
+            return None
+        large = extract(img_response.content, self.ZEROCHAN_IMAGE_RULES)['image']
+        return large[0] if large else None
+    
+    def scrape_tenor_gifs(self, character_name: str, series: str) -> List[ImageRecord]:
         """Scrape animated GIFs from Tenor"""
         images = []
         
@@ -299,7 +384,7 @@ class AdvancedCharacterScraper:
                 'media_filter': 'gif'
             }
             
-            response = self.session.get(search_url, params=search_params, timeout=10)
+            response = self._get_page(search_url, params=search_params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 
@@ -307,14 +392,11 @@ class AdvancedCharacterScraper:
                     gif_url = result.get('media_formats', {}).get('gif', {}).get('url')
                     
                     if gif_url:
-                        img_data = {
-                            'url': gif_url,
-                            'tier': 'animated',
-                            'source': 'tenor',
-                            'quality_score': self.calculate_quality_score(gif_url),
-                            'alt_text': result.get('content_description', ''),
-                            'page_url': result.get('itemurl', '')
-                        }
+                        img_data = ImageRecord(
+                            gif_url, 'animated', 'tenor', 0,
+                            alt_text=result.get('content_description', ''),
+                            page_url=result.get('itemurl', '')
+                        )
                         
                         images.append(img_data)
         
@@ -324,66 +406,116 @@ class AdvancedCharacterScraper:
         return images
     
     def calculate_quality_score(self, img_url: str) -> int:
-        """Calculate quality score based on URL patterns"""
-        score = 5  # Base score
-        
-        url_lower = img_url.lower()
-        
-        # Resolution indicators
-        if any(res in url_lower for res in ['1080', '720', '4k', 'uhd']):
-            score += 3
-        elif any(res in url_lower for res in ['480', '360']):
-            score -= 1
-        
-        # Quality indicators
-        if 'thumbnail' in url_lower or 'thumb' in url_lower:
-            score -= 2
-        elif 'original' in url_lower or 'full' in url_lower:
-            score += 2
-        
-        # File format quality
-        if url_lower.endswith('.png'):
-            score += 1
-        elif url_lower.endswith('.jpg') or url_lower.endswith('.jpeg'):
-            score += 0  # Neutral
-        elif url_lower.endswith('.gif'):
-            score += 1  # Animated bonus
-        
-        return max(1, score)  # Minimum score of 1
+        """Calculate quality score based on URL patterns (see quality_scoring)"""
+        return score_url(img_url)
+    
+    def apply_probe_score(self, img_data: Dict, validation_info: Dict):
+        """Swap the URL-based resolution guess for the probed resolution"""
+        if 'width' in validation_info:
+            img_data['quality_score'] = score_image(img_data)
     
     def validate_image(self, img_url: str) -> Tuple[bool, Dict]:
-        """Validate image quality and accessibility"""
+        """Validate image quality and accessibility (cached, see ValidationCache)"""
         try:
-            response = self.session.head(img_url, timeout=5)
-            
-            if response.status_code != 200:
-                return False, {'error': f'HTTP {response.status_code}'}
-            
-            # Check content type
-            content_type = response.headers.get('content-type', '').lower()
-            if not any(img_type in content_type for img_type in ['image/', 'gif']):
-                return False, {'error': 'Invalid content type'}
-            
-            # Check file size
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > self.max_file_size:
-                return False, {'error': 'File too large'}
-            
-            return True, {'content_type': content_type, 'size': content_length}
-            
+            return validate_with_cache(
+                self.validation_cache, img_url,
+                lambda url, headers: self._head(url, headers=headers, timeout=5),
+                self.check_image_response
+            )
         except Exception as e:
             return False, {'error': str(e)}
     
-    def scrape_character_complete(self, character_name: str, series: str) -> Dict:
+    def check_image_response(self, response: requests.Response) -> Tuple[bool, Dict]:
+        """Judge a HEAD response against the image quality filters"""
+        if response.status_code != 200:
+            return False, {'error': f'HTTP {response.status_code}'}
+        
+        # Check content type
+        content_type = response.headers.get('content-type', '').lower()
+        if not any(img_type in content_type for img_type in ['image/', 'gif']):
+            return False, {'error': 'Invalid content type'}
+        
+        # Check file size
+        content_length = response.headers.get('content-length')
+        if content_length and int(content_length) > self.max_file_size:
+            return False, {'error': 'File too large'}
+        
+        info = {'content_type': content_type, 'size': content_length}
+        
+        # Real dimensions from the first few KB (unknown formats pass unchecked; a failed
+        # probe raises ProbeError, so the result is reported as an error and never cached)
+        header = probe_image(response.url, self._get_range)
+        if header:
+            info.update(header)
+            min_width, min_height = self.min_image_size
+            if header['width'] < min_width or header['height'] < min_height:
+                return False, {'error': f"Image too small ({header['width']}x{header['height']})", **header}
+        
+        return True, info
+    
+    def validate_images(self, unique_images: Dict[str, Dict], max_workers: Optional[int] = None,
+                        time_budget: Optional[float] = None) -> List[Tuple[Dict, bool, Dict]]:
         """
-        Complete character scraping from all sources
-        Returns organized data ready for card generation
+        Validate deduplicated images concurrently
+        Returns (img_data, is_valid, validation_info) in quality score order
         """
-        print(f"Scraping character: {character_name} from {series}")
-        
-        all_images = []
+        results = validate_batch(
+            unique_images, self.validate_image,
+            max_workers=max_workers or self.validation_workers,
+            time_budget=time_budget if time_budget is not None else self.validation_time_budget
+        )
+        self.validation_cache.save()
+        return results
+    
+    def new_tier_buckets(self) -> TierBuckets:
+        return TierBuckets(self.images_per_tier, max_boost=self.probe_score_boost)
+    
+    def _accept_image(self, img_data: Dict, validation_info: Dict):
+        img_data['validation'] = validation_info
+        self.apply_probe_score(img_data, validation_info)
+    
+    def validate_into_buckets(self, unique_images: Dict[str, Dict], buckets: TierBuckets) -> List[Tuple[Dict, bool, Dict]]:
+        """
+        Validate best-first into per-tier top-k buckets; candidates that can no
+        longer make their tier are never requested
+        """
+        results = validate_top_k(
+            unique_images, self.validate_image, buckets, self._accept_image,
+            max_workers=self.validation_workers, time_budget=self.validation_time_budget
+        )
+        self.validation_cache.save()
+        return results
+    
+    def _run_source(self, source_func, character_name: str, series: str) -> List[ImageRecord]:
+        """Run one image source (timed), reusing results journaled before a restart"""
+        source = source_func.__name__
+        if self.checkpoint is not None:
+            images = self.checkpoint.source_images(character_name, series, source)
+            if images is not None:
+                return from_dicts(images)
         
-        # Scrape from all sources
+        try:
+            with self.resilience.source(source) as call, metrics.timer('source_seconds', source=source):
+                images = source_func(character_name, series)
+        except Exception:
+            metrics.inc('source_errors_total', source=source)
+            raise
+        for img, score in zip(images, score_images(images)):
+            img['quality_score'] = score
+        metrics.inc('source_images_total', len(images), source=source)
+        
+        # Don't journal a source whose requests all failed; a resumed batch retries it
+        if self.checkpoint is not None and not call.all_failed:
+            self.checkpoint.record_source(character_name, series, source, to_dicts(images))
+        return images
+    
+    def iter_source_images(self, character_name: str, series: str,
+                           concurrent: bool = False, max_workers: int = 5) -> Iterator[Dict]:
+        """
+        Query every image source and yield its images as soon as it finishes,
+        skipping URLs already yielded. With concurrent=True all sources run at
+        once; pacing is left to the per-host rate limiter.
+        """
         sources = [
             self.scrape_mudae_character_images,
             self.scrape_anime_planet_images,
@@ -392,91 +524,277 @@ class AdvancedCharacterScraper:
             self.scrape_tenor_gifs,
         ]
         
-        for scraper_func in sources:
-            try:
-                source_images = scraper_func(character_name, series)
-                all_images.extend(source_images)
-                time.sleep(0.5)  # Rate limiting
-            except Exception as e:
-                print(f"Error with {scraper_func.__name__}: {e}")
-                continue
-        
-        # Remove duplicates based on URL
-        unique_images = {}
-        for img in all_images:
-            url_hash = hashlib.md5(img['url'].encode()).hexdigest()
-            if url_hash not in unique_images:
-                unique_images[url_hash] = img
-        
-        # Validate and sort images
-        validated_images = []
-        for img_data in unique_images.values():
-            is_valid, validation_info = self.validate_image(img_data['url'])
-            if is_valid:
-                img_data['validation'] = validation_info
-                validated_images.append(img_data)
+        seen = set()
+        
+        def unseen(source_images: List[Dict]) -> List[Dict]:
+            fresh = []
+            for img in source_images:
+                url_hash = hashlib.md5(img['url'].encode()).hexdigest()
+                if url_hash not in seen:
+                    seen.add(url_hash)
+                    fresh.append(img)
+            return fresh
+        
+        if not concurrent:
+            for scraper_func in sources:
+                try:
+                    source_images = self._run_source(scraper_func, character_name, series)
+                except Exception as e:
+                    print(f"Error with {scraper_func.__name__}: {e}")
+                    continue
+                yield from unseen(source_images)
+            return
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._run_source, scraper_func, character_name, series): scraper_func
+                for scraper_func in sources
+            }
+            for future in as_completed(futures):
+                try:
+                    source_images = future.result()
+                except Exception as e:
+                    print(f"Error with {futures[future].__name__}: {e}")
+                    continue
+                yield from unseen(source_images)
+    
+    def collect_source_images(self, character_name: str, series: str,
+                              concurrent: bool = False, max_workers: int = 5) -> Dict[str, Dict]:
+        """
+        Query every image source and merge the results, deduplicated by URL.
+        With concurrent=True all sources run at once and results are merged
+        as each source finishes.
+        """
+        return {
+            hashlib.md5(img['url'].encode()).hexdigest(): img
+            for img in self.iter_source_images(character_name, series, concurrent, max_workers)
+        }
+    
+    def download_character_images(self, images: List[Dict]) -> int:
+        """
+        Download images into the content-addressed store (skipping ones already there)
+        and point their records at the local copies. Returns the number stored.
+        """
+        pending = [img for img in images if not self.image_store.has(img.get('local_path'))]
+        
+        def download(img: Dict) -> bool:
+            with self.request_budget or nullcontext():
+                stored = self.image_store.download(img['url'], img['tier'], self._open_stream)
+            if stored is None:
+                return False
+            metrics.inc('download_bytes_total', stored['size'], tier=img['tier'])
+            img.update(stored)
+            return True
+        
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            stored = sum(executor.map(download, pending))
+        if pending:
+            print(f"  Downloaded {stored}/{len(pending)} images")
+        return stored
+    
+    def rerank_character(self, character_name: str, series: str) -> Optional[Dict]:
+        """Rescore a stored character's images in one batch and keep the best per tier"""
+        char_key = character_key(character_name, series)
+        character_data = self.character_db.get(char_key)
+        if not character_data or 'images' not in character_data:
+            return None
+        
+        images = [img for tier_images in character_data['images'].values() for img in tier_images]
+        scores = score_images(images)
+        for img, score in zip(images, scores):
+            img['quality_score'] = score
+        character_data['images'] = rank_by_tier(images, scores, k=self.images_per_tier)
         
-        # Sort by quality score (highest first)
-        validated_images.sort(key=lambda x: x['quality_score'], reverse=True)
+        self.character_db[char_key] = character_data
+        return character_data
+    
+    def _finish_character(self, character_name: str, series: str, buckets: TierBuckets) -> Dict:
+        """Store the best validated images per tier as the character record"""
+        # Organized by tier, highest quality score first
+        with metrics.timer('phase_seconds', phase='organize'):
+            ranked = buckets.ranked()
         
-        # Organize by tier
-        organized_images = {
-            'static': [],
-            '3d': [],
-            'animated': []
-        }
+        if self.download_images:
+            with metrics.timer('phase_seconds', phase='download'):
+                self.download_character_images(list(buckets))
         
-        for img in validated_images:
-            tier = img['tier']
-            if tier in organized_images:
-                organized_images[tier].append(img)
+        # Records back to the JSON shape stored in the database
+        organized_images = {tier: to_dicts(tier_images) for tier, tier_images in ranked.items()}
         
         # Character data structure
         character_data = {
             'name': character_name,
             'series': series,
             'images': organized_images,
-            'total_images': len(validated_images),
+            'total_images': buckets.accepted,
             'scrape_date': time.strftime('%Y-%m-%d %H:%M:%S'),
             'versions': {
-                'static': min(len(organized_images['static']), 250),
-                '3d': min(len(organized_images['3d']), 250),
-                'animated': min(len(organized_images['animated']), 250)
+                'static': len(organized_images['static']),
+                '3d': len(organized_images['3d']),
+                'animated': len(organized_images['animated'])
             }
         }
         
-        # Update character database
-        char_key = f"{character_name}_{series}".replace(' ', '_').lower()
-        self.character_db[char_key] = character_data
-        self.save_character_db()
+        # Update character database (writes only this character's record)
+        with metrics.timer('phase_seconds', phase='save'):
+            self.character_db[character_key(character_name, series)] = character_data
         
-        print(f"✓ Found {len(validated_images)} images for {character_name}")
+        print(f"✓ Found {buckets.accepted} images for {character_name}")
         print(f"  - Static: {len(organized_images['static'])}")
         print(f"  - 3D: {len(organized_images['3d'])}")
         print(f"  - Animated: {len(organized_images['animated'])}")
         
         return character_data
     
-    def batch_scrape_characters(self, character_list: List[Tuple[str, str]]) -> Dict:
+    def scrape_character_complete(self, character_name: str, series: str,
+                                  concurrent: bool = False) -> Dict:
+        """
+        Complete character scraping from all sources
+        Returns organized data ready for card generation
+        """
+        print(f"Scraping character: {character_name} from {series}")
+        
+        # Scrape from all sources and remove duplicates based on URL
+        with metrics.timer('phase_seconds', phase='collect'):
+            unique_images = self.collect_source_images(character_name, series, concurrent=concurrent)
+        
+        # Optionally drop the same artwork served under different URLs
+        char_key = character_key(character_name, series)
+        if self.perceptual_dedup:
+            with metrics.timer('phase_seconds', phase='dedup'):
+                unique_images = self.perceptual_dedup.filter(unique_images, char_key)
+        
+        # Validate best-first, keeping the top images of each tier
+        buckets = self.new_tier_buckets()
+        with metrics.timer('phase_seconds', phase='validate'):
+            self.validate_into_buckets(unique_images, buckets)
+        
+        if self.perceptual_dedup:
+            self.perceptual_dedup.remember(list(buckets), char_key)
+        
+        return self._finish_character(character_name, series, buckets)
+    
+    def stream_character(self, character_name: str, series: str,
+                         concurrent: bool = True) -> Iterator[Tuple[str, Dict]]:
+        """
+        Streaming version of scrape_character_complete.
+        Yields ('image', img_data) for every image that enters its tier's top
+        list as soon as it validates, while slower sources are still running,
+        then ('character', character_data) once everything is stored. Perceptual dedup needs the full candidate
+        set and is only applied by scrape_character_complete.
+        """
+        print(f"Streaming character: {character_name} from {series}")
+        
+        buckets = self.new_tier_buckets()
+        candidates = self.iter_source_images(character_name, series, concurrent=concurrent)
+        for img_data, is_valid, validation_info in iter_validate(
+                candidates, self.validate_image,
+                max_workers=self.validation_workers, time_budget=self.validation_time_budget,
+                should_validate=buckets.could_accept):
+            if is_valid:
+                self._accept_image(img_data, validation_info)
+                if buckets.offer(img_data):
+                    yield 'image', img_data.to_dict()
+        self.validation_cache.save()
+        
+        yield 'character', self._finish_character(character_name, series, buckets)
+    
+    async def astream_character(self, character_name: str, series: str,
+                                concurrent: bool = True) -> AsyncIterator[Tuple[str, Dict]]:
+        """Async-iterator version of stream_character"""
+        async for event in aiterate(lambda: self.stream_character(character_name, series, concurrent)):
+            yield event
+    
+    def iter_characters(self, character_list: List[Tuple[str, str]], concurrent: bool = False,
+                        max_characters: int = 4, max_in_flight: int = 64) -> Iterator[Tuple[str, Dict]]:
+        """
+        Scrape characters concurrently and yield (name, character_data) as each finishes,
+        without keeping a results dict in memory
+        """
+        scheduler = BatchScheduler(max_characters, max_in_flight, self.rate_limiter)
+        scheduler.attach(self)
+        try:
+            for char_name, series, char_data in scheduler.iter_run(
+                    character_list,
+                    lambda char_name, series: self.scrape_character_complete(
+                        char_name, series, concurrent=concurrent)):
+                yield char_name, char_data
+        finally:
+            self.request_budget = None
+    
+    async def aiter_characters(self, character_list: List[Tuple[str, str]], concurrent: bool = False,
+                               max_characters: int = 4, max_in_flight: int = 64) -> AsyncIterator[Tuple[str, Dict]]:
+        """Async-iterator version of iter_characters"""
+        async for item in aiterate(lambda: self.iter_characters(
+                character_list, concurrent, max_characters, max_in_flight)):
+            yield item
+    
+    def known_characters(self, character_list: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Name -> database key for characters already collected, matched by exact normalized name and series"""
+        index = NameIndex.build(self.character_db, anilist_cache=None, versions=None)
+        known = {}
+        for char_name, series in character_list:
+            key = index.resolve(char_name, series, source='database')
+            if key is not None:
+                known[char_name] = key
+        return known
+    
+    def batch_scrape_characters(self, character_list: List[Tuple[str, str]],
+                                concurrent: bool = False, max_characters: int = 1,
+                                max_in_flight: int = 64, checkpoint_path: Optional[str] = None,
+                                skip_existing: bool = False) -> Dict:
         """
         Batch scrape multiple characters
         character_list: List of (character_name, series) tuples
+        concurrent: query each character's sources in parallel
+        max_characters: characters processed at once (shares max_in_flight requests)
+        checkpoint_path: journal that lets an interrupted batch resume where it stopped
+        skip_existing: don't scrape characters already in the database (case, accents and punctuation ignored)
         """
-        results = {}
+        known = self.known_characters(character_list) if skip_existing else {}
+        if known:
+            print(f"Skipping {len(known)} characters already in the database")
+        to_scrape = [(char_name, series) for char_name, series in character_list if char_name not in known]
         
-        for i, (char_name, series) in enumerate(character_list):
-            print(f"\n[{i+1}/{len(character_list)}] Processing {char_name}")
-            
-            try:
-                char_data = self.scrape_character_complete(char_name, series)
-                results[char_name] = char_data
-                
-                # Rate limiting between characters
-                time.sleep(2)
+        self.checkpoint = BatchCheckpoint(checkpoint_path) if checkpoint_path else None
+        try:
+            if max_characters > 1:
+                scheduler = BatchScheduler(max_characters, max_in_flight, self.rate_limiter)
+                scheduler.attach(self)
+                results = scheduler.run(
+                    to_scrape,
+                    lambda char_name, series: self.scrape_character_complete(
+                        char_name, series, concurrent=concurrent),
+                    checkpoint=self.checkpoint
+                )
+            else:
+                results = {}
+                pending = self.checkpoint.pending(to_scrape) if self.checkpoint else to_scrape
                 
-            except Exception as e:
-                print(f"Error processing {char_name}: {e}")
-                results[char_name] = {'error': str(e)}
+                for i, (char_name, series) in enumerate(pending):
+                    print(f"\n[{i+1}/{len(pending)}] Processing {char_name}")
+                    
+                    try:
+                        char_data = self.scrape_character_complete(char_name, series, concurrent=concurrent)
+                        results[char_name] = char_data
+                        
+                    except Exception as e:
+                        print(f"Error processing {char_name}: {e}")
+                        results[char_name] = {'error': str(e)}
+                    
+                    if self.checkpoint:
+                        self.checkpoint.record_result(char_name, series, results[char_name])
+        finally:
+            self.request_budget = None
+            if self.checkpoint:
+                self.checkpoint.close()
+                self.checkpoint = None
+        
+        # Characters finished by an earlier run (or skipped as known) come from the database
+        for char_name, series in character_list:
+            if char_name not in results:
+                results[char_name] = self.character_db.get(
+                    known.get(char_name) or character_key(char_name, series), {'error': 'Not found in database'})
         
         return results
 
@@ -495,6 +813,10 @@ if __name__ == "__main__":
     
     print("Starting character scraping...")
     results = scraper.batch_scrape_characters(test_characters)
+    scraper.save_character_db()  # Refresh the JSON export once per batch
+    metrics.write(scraper.base_dir / "metrics.prom")  # Prometheus text; use a .json path for JSON
+    print("\nTime breakdown:")
+    print(metrics.summary())
     
     print("\n=== SCRAPING COMPLETE ===")
     for char_name, result in results.items():
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Multi-Character Batch Scheduler
+Runs several characters at once under one global in-flight request budget.
+Per-host token buckets are shared by every character. The collectors write
+each character to the database as it finishes, and the scheduler also hands
+it to an optional callback at that point. A BatchCheckpoint journal lets a
+killed batch resume without repeating finished characters or sources.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from rate_limiter import HostRateLimiter, RequestBudget, shared_limiter
+
+ProcessFn = Callable[[str, str], Dict]
+ResultFn = Callable[[str, str, Dict], None]
+
+
+class BatchCheckpoint:
+    """
+    Append-only JSONL journal of batch progress.
+    Records finished and failed (name, series) pairs plus each source's images
+    for characters still in progress; replayed on open so a restarted batch
+    skips completed work and reuses partial results.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.completed = set()
+        self.failed = {}
+        self.partial = {}
+        self.lock = threading.Lock()
+        self.load()
+        self.compact()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def load(self):
+        """Replay the journal (a torn last line from a crash is ignored)"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                pair = (entry['name'], entry['series'])
+                if entry['event'] == 'done':
+                    self.completed.add(pair)
+                    self.failed.pop(pair, None)
+                    self.partial.pop(pair, None)
+                elif entry['event'] == 'failed':
+                    self.failed[pair] = entry.get('error', '')
+                elif entry['event'] == 'source':
+                    self.partial.setdefault(pair, {})[entry['source']] = entry['images']
+
+    def compact(self):
+        """Rewrite the journal without source entries of finished characters"""
+        entries = [{'event': 'done', 'name': name, 'series': series}
+                   for name, series in sorted(self.completed)]
+        entries += [{'event': 'failed', 'name': name, 'series': series, 'error': error}
+                    for (name, series), error in self.failed.items()]
+        entries += [{'event': 'source', 'name': name, 'series': series,
+                     'source': source, 'images': images}
+                    for (name, series), sources in self.partial.items()
+                    for source, images in sources.items()]
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def _append(self, entry: Dict):
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def pending(self, character_list: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Characters that still need work (new ones and previous failures)"""
+        return [pair for pair in character_list if tuple(pair) not in self.completed]
+
+    def source_images(self, name: str, series: str, source: str) -> Optional[List[Dict]]:
+        """Images a source returned before a restart, if any"""
+        return self.partial.get((name, series), {}).get(source)
+
+    def record_source(self, name: str, series: str, source: str, images: List[Dict]):
+        self.partial.setdefault((name, series), {})[source] = images
+        self._append({'event': 'source', 'name': name, 'series': series,
+                      'source': source, 'images': images})
+
+    def record_result(self, name: str, series: str, char_data: Dict):
+        """Mark a character done, or failed if its result carries an error"""
+        pair = (name, series)
+        if 'error' in char_data:
+            self.failed[pair] = char_data['error']
+            self._append({'event': 'failed', 'name': name, 'series': series,
+                          'error': char_data['error']})
+        else:
+            self.completed.add(pair)
+            self.failed.pop(pair, None)
+            self.partial.pop(pair, None)
+            self._append({'event': 'done', 'name': name, 'series': series})
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class BatchScheduler:
+    def __init__(self, max_characters: int = 8, max_in_flight: int = 64,
+                 rate_limiter: Optional[HostRateLimiter] = None):
+        self.max_characters = max_characters
+        self.budget = RequestBudget(max_in_flight)
+        self.rate_limiter = rate_limiter or shared_limiter
+
+    def attach(self, collector):
+        """Make a collector draw from this scheduler's request budget and host limits"""
+        collector.request_budget = self.budget
+        collector.rate_limiter = self.rate_limiter
+        return collector
+
+    def iter_run(self, character_list: List[Tuple[str, str]], process: ProcessFn,
+                 checkpoint: Optional[BatchCheckpoint] = None) -> Iterator[Tuple[str, str, Dict]]:
+        """
+        Process (name, series) pairs concurrently and yield (name, series, character_data)
+        as each finishes. Only about two characters per worker are queued at a time,
+        so memory stays flat for arbitrarily long lists.
+        With a checkpoint, characters it has already completed are skipped.
+        """
+        if checkpoint is not None:
+            character_list = checkpoint.pending(character_list)
+        total = len(character_list)
+        queued = iter(character_list)
+        pending = {}
+        done = 0
+
+        executor = ThreadPoolExecutor(max_workers=self.max_characters)
+        try:
+            def fill():
+                while len(pending) < self.max_characters * 2:
+                    pair = next(queued, None)
+                    if pair is None:
+                        return
+                    pending[executor.submit(process, *pair)] = pair
+
+            fill()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    char_name, series = pending.pop(future)
+                    try:
+                        char_data = future.result()
+                    except Exception as e:
+                        print(f"Error processing {char_name}: {e}")
+                        char_data = {'error': str(e)}
+
+                    done += 1
+                    print(f"[{done}/{total}] Finished {char_name}")
+                    if checkpoint is not None:
+                        checkpoint.record_result(char_name, series, char_data)
+                    yield char_name, series, char_data
+                fill()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, character_list: List[Tuple[str, str]], process: ProcessFn,
+            on_result: Optional[ResultFn] = None,
+            checkpoint: Optional[BatchCheckpoint] = None) -> Dict:
+        """
+        Process (name, series) pairs concurrently, started in submission order.
+        on_result is called as each character finishes; the returned
+        {name: character_data or {'error': ...}} is ordered like character_list,
+        as with the serial batch methods.
+        With a checkpoint, characters it has already completed are skipped.
+        """
+        results = {}
+        for char_name, series, char_data in self.iter_run(character_list, process, checkpoint):
+            results[char_name] = char_data
+            if on_result is not None:
+                try:
+                    on_result(char_name, series, char_data)
+                except Exception as e:
+                    print(f"Error in result callback for {char_name}: {e}")
+        return {char_name: results[char_name] for char_name, _ in character_list if char_name in results}
+
+
+class _IteratorFailure:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def aiterate(make_iterator: Callable[[], Iterator], max_buffered: int = 16) -> AsyncIterator:
+    """
+    Expose a blocking iterator as an async iterator.
+    The iterator runs on a worker thread; items are handed to the event loop
+    through a bounded queue so a slow consumer applies back-pressure.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue(maxsize=max_buffered)
+    stopped = threading.Event()
+    end = object()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(items.put(item), loop).result()
+
+    def produce():
+        iterator = make_iterator()
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(_IteratorFailure(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            if not stopped.is_set():
+                put(end)
+
+    worker = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await items.get()
+            if item is end:
+                break
+            if isinstance(item, _IteratorFailure):
+                raise item.error
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stopped.set()
+        while not items.empty():
+            items.get_nowait()
+        await worker
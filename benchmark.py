@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Offline Scraper Benchmark
+Runs the batch entry points of AdvancedCharacterScraper, ImageCollector and
+MudaeCharacterScraper against a local fixture server that stands in for
+every site they use (Mudae, Anime-Planet, MyAnimeList, Zerochan, Tenor,
+waifu.pics, nekos.life, waifu.im, Pushshift, Danbooru and their image CDNs).
+A requests adapter reroutes all traffic to the fixture server, so nothing
+reaches the live sites. Latency and error injection are configurable and
+seeded; the report gives characters/sec, requests/sec, p50/p99 per phase,
+source and host, and peak memory, so numbers can be compared across versions.
+
+Usage:
+    python benchmark.py --characters 20 --latency 0.02 --error-rate 0.02
+    python benchmark.py --suite advanced --max-characters 4 --concurrent --output bench_output.txt
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from rate_limiter import HostRateLimiter
+from resilience import Resilience
+
+SUITES = ('advanced', 'collector', 'mudae')
+
+# (width, height) choices for fixture images; the last one is below both collectors' minimums
+IMAGE_SIZES = ((1200, 1600), (1080, 1920), (800, 800), (640, 480), (90, 90))
+
+
+# --- fixture content ---------------------------------------------------------
+
+def _token(*parts) -> str:
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()[:12]
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+@lru_cache(maxsize=None)
+def _png_pixels(width: int, height: int) -> bytes:
+    return zlib.compress(b'\x00' * ((width + 1) * height), 9)
+
+
+def png_bytes(width: int, height: int, token: str) -> bytes:
+    """Valid grayscale PNG; the tEXt chunk keeps every fixture image's bytes distinct"""
+    return (b'\x89PNG\r\n\x1a\n'
+            + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + _png_chunk(b'tEXt', b'fixture\x00' + token.encode())
+            + _png_chunk(b'IDAT', _png_pixels(width, height))
+            + _png_chunk(b'IEND', b''))
+
+
+def gif_bytes(width: int, height: int, token: str, frames: int = 3) -> bytes:
+    """Minimal animated GIF (1x1 frames on a width x height canvas)"""
+    data = b'GIF89a' + struct.pack('<HHBBB', width, height, 0x80, 0, 0) + b'\x00\x00\x00\xff\xff\xff'
+    comment = token.encode()
+    data += b'\x21\xfe' + bytes([len(comment)]) + comment + b'\x00'
+    for _ in range(frames):
+        data += b'\x2c' + struct.pack('<HHHHB', 0, 0, 1, 1, 0) + b'\x02\x02\x44\x01\x00'
+    return data + b'\x3b'
+
+
+class FixtureSite:
+    """Synthetic responses shaped like each endpoint the scrapers parse"""
+
+    def __init__(self, mudae_pages: int = 20, rows_per_page: int = 50):
+        self.mudae_pages = mudae_pages
+        self.rows_per_page = rows_per_page
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def next_id(self) -> int:
+        """Fresh id for 'random image' endpoints"""
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def image(self, path: str) -> Tuple[int, str, bytes]:
+        token = _token(path)
+        width, height = IMAGE_SIZES[int(token, 16) % len(IMAGE_SIZES)]
+        if path.endswith('.gif'):
+            return 200, 'image/gif', gif_bytes(width, height, token)
+        return 200, 'image/png', png_bytes(width, height, token)
+
+    def route(self, host: str, path: str, query: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        if path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
+            return self.image(f'{host}{path}')
+
+        key = (host, path, sorted(query.items()))
+        handler = {
+            'mudae.net': self.mudae,
+            'www.anime-planet.com': self.anime_planet,
+            'myanimelist.net': self.myanimelist,
+            'www.zerochan.net': self.zerochan,
+            'tenor.googleapis.com': self.tenor,
+            'api.waifu.pics': self.waifu_pics,
+            'nekos.life': self.nekos_life,
+            'api.waifu.im': self.waifu_im,
+            'api.pushshift.io': self.pushshift,
+            'danbooru.donmai.us': self.danbooru,
+        }.get(host)
+        if handler is None:
+            return 404, 'text/plain', b'no fixture'
+        return handler(path, query, _token(*key))
+
+    @staticmethod
+    def html(body: str) -> Tuple[int, str, bytes]:
+        return 200, 'text/html; charset=utf-8', f'<html><body>{body}</body></html>'.encode()
+
+    @staticmethod
+    def json(data) -> Tuple[int, str, bytes]:
+        return 200, 'application/json', json.dumps(data).encode()
+
+    def mudae(self, path, query, token):
+        if path == '/characters/search':
+            links = ''.join(f'<a href="/characters/{int(token[i:i + 4], 16)}">Result</a>' for i in range(0, 12, 4))
+            return self.html(links)
+        if path.startswith('/characters/'):
+            char_id = path.rsplit('/', 1)[-1]
+            images = ''.join(f'<img src="/uploads/{char_id}_{n}.png" alt="{char_id}">' for n in range(4))
+            return self.html(images + f'<img src="/uploads/{char_id}_anim.gif">')
+        if path == '/search':
+            page = int(query.get('page', ['1'])[0])
+            if page > self.mudae_pages:
+                return self.html('<table></table>')
+            rows = []
+            for n in range(self.rows_per_page):
+                char_id = (page - 1) * self.rows_per_page + n
+                rows.append(f'<tr><td><img src="/uploads/thumbnails/c{char_id}.png"></td>'
+                            f'<td><a href="/character/{char_id}/">Character {char_id}</a></td>'
+                            f'<td><a href="/series/{char_id % 97}/">Series {char_id % 97}</a></td></tr>')
+            return self.html('<table>' + ''.join(rows) + '</table>')
+        return 404, 'text/plain', b'no fixture'
+
+    def anime_planet(self, path, query, token):
+        cards = ''.join(f'<div class="character"><img src="/images/characters/{token}_{n}.png" alt="card">'
+                        f'<img src="/images/extra/{token}_{n}.png"></div>' for n in range(5))
+        return self.html(cards)
+
+    def myanimelist(self, path, query, token):
+        cells = ''.join(f'<td class="borderClass"><img data-src="https://cdn.myanimelist.net/images/'
+                        f'characters/{token}_{n}.png" alt="mal"></td>' for n in range(3))
+        return self.html(f'<table><tr>{cells}</tr></table>')
+
+    def zerochan(self, path, query, token):
+        if path == '/search':
+            return self.html(''.join(f'<a href="/{int(token[i:i + 3], 16) + 1000 * i}">thumb</a>'
+                                     for i in range(8)))
+        post = path.strip('/')
+        return self.html(f'<img id="large" src="https://static.zerochan.net/{post}.full.png" alt="zc">')
+
+    def tenor(self, path, query, token):
+        results = [{'media_formats': {'gif': {'url': f'https://media.tenor.com/{token}_{n}.gif'}},
+                    'content_description': 'gif', 'itemurl': f'https://tenor.com/view/{token}_{n}'}
+                   for n in range(10)]
+        return self.json({'results': results})
+
+    def waifu_pics(self, path, query, token):
+        if path.startswith('/many/'):
+            return self.json({'files': [f'https://i.waifu.pics/{self.next_id()}.png' for _ in range(30)]})
+        return self.json({'url': f'https://i.waifu.pics/{self.next_id()}.png'})
+
+    def nekos_life(self, path, query, token):
+        return self.json({'url': f'https://cdn.nekos.life{path}/{self.next_id()}.png'})
+
+    def waifu_im(self, path, query, token):
+        return self.json({'images': [{'url': f'https://cdn.waifu.im/{token}_{n}.png', 'tags': []}
+                                     for n in range(10)]})
+
+    def pushshift(self, path, query, token):
+        posts = [{'url': f'https://i.redd.it/{token}_{n}.{"gif" if n % 5 == 0 else "png"}',
+                  'title': 'post', 'score': (n * 137) % 1500} for n in range(10)]
+        return self.json({'data': posts})
+
+    def danbooru(self, path, query, token):
+        posts = [{'file_url': f'https://cdn.donmai.us/original/{token}_{n}.png', 'score': (n * 17) % 90,
+                  'tag_string': 'solo 3d' if n % 4 == 0 else 'solo'} for n in range(20)]
+        return self.json(posts)
+
+
+# --- fixture server ----------------------------------------------------------
+
+class FixtureServer:
+    """
+    Local HTTP server for FixtureSite. Requests arrive as /<host>/<path>?<query>.
+    latency/jitter are seconds added to every response; error_rate is the
+    fraction answered with 503. All randomness comes from one seeded RNG.
+    """
+
+    def __init__(self, site: FixtureSite, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.site = site
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests = 0
+        self.injected_errors = 0
+
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # Headers and body are separate writes on keep-alive sockets
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fixture.handle(self, send_body=True)
+
+            def do_HEAD(self):
+                fixture.handle(self, send_body=False)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                fixture.handle(self, send_body=True)
+
+        ThreadingHTTPServer.request_queue_size = 256
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fixture-server', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self) -> 'FixtureServer':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, request: BaseHTTPRequestHandler, send_body: bool):
+        with self.rng_lock:
+            self.requests += 1
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        if delay:
+            time.sleep(delay)
+
+        parts = urlsplit(request.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        if fail:
+            status, content_type, body = 503, 'text/plain', b'injected error'
+        else:
+            status, content_type, body = self.site.route(host, '/' + path, parse_qs(parts.query))
+
+        headers = {'Content-Type': content_type, 'Accept-Ranges': 'bytes'}
+        byte_range = request.headers.get('Range')
+        if status == 200 and byte_range and byte_range.startswith('bytes='):
+            start_text, _, end_text = byte_range[6:].partition('-')
+            start = int(start_text or 0)
+            end = min(int(end_text), len(body) - 1) if end_text else len(body) - 1
+            if start >= len(body):
+                status, body = 416, b''
+                headers['Content-Range'] = f'bytes */{len(body)}'
+            else:
+                status = 206
+                headers['Content-Range'] = f'bytes {start}-{end}/{len(body)}'
+                body = body[start:end + 1]
+
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        if send_body:
+            request.wfile.write(body)
+
+
+class FixtureAdapter(HTTPAdapter):
+    """Reroutes every request of a session to the fixture server"""
+
+    def __init__(self, base_url: str, **kwargs):
+        self.base_url = base_url
+        kwargs.setdefault('pool_connections', 32)
+        kwargs.setdefault('pool_maxsize', 64)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        original_url = request.url
+        parts = urlsplit(original_url)
+        request.url = f"{self.base_url}/{parts.netloc}{parts.path or '/'}" + (f'?{parts.query}' if parts.query else '')
+        response = super().send(request, **kwargs)
+        response.url = original_url  # Scrapers see the URL they asked for
+        return response
+
+
+def route_to_fixtures(session: requests.Session, base_url: str):
+    adapter = FixtureAdapter(base_url)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+
+# --- suites ------------------------------------------------------------------
+
+def character_list(count: int) -> List[Tuple[str, str]]:
+    return [(f'Bench Character {i:03d}', f'Bench Series {i % 7}') for i in range(count)]
+
+
+def run_advanced(args, base_url: str, limiter: HostRateLimiter) -> int:
+    from advanced_scraper import AdvancedCharacterScraper
+    scraper = AdvancedCharacterScraper(rate_limiter=limiter, resilience=Resilience())
+    scraper.download_images = args.download
+    route_to_fixtures(scraper.session, base_url)
+    results = scraper.batch_scrape_characters(character_list(args.characters), concurrent=args.concurrent,
+                                              max_characters=args.max_characters,
+                                              max_in_flight=args.max_in_flight)
+    scraper.character_db.close()
+    return sum('error' not in result for result in results.values())
+
+
+def run_collector(args, base_url: str, limiter: HostRateLimiter) -> int:
+    from image_collector import ImageCollector
+    collector = ImageCollector(rate_limiter=limiter, resilience=Resilience())
+    route_to_fixtures(collector.session, base_url)
+    results = collector.batch_collect(character_list(args.characters), max_characters=args.max_characters,
+                                      max_in_flight=args.max_in_flight)
+    collector.character_db.close()
+    return sum('error' not in result for result in results.values())
+
+
+def run_mudae(args, base_url: str, limiter: HostRateLimiter) -> int:
+    from mudae_scraper import MudaeCharacterScraper
+    scraper = MudaeCharacterScraper(rate_limiter=limiter, resilience=Resilience())
+    route_to_fixtures(scraper.session, base_url)
+    return len(scraper.scrape_mudae_search(limit=args.mudae_limit, window=args.window))
+
+
+RUNNERS = {'advanced': run_advanced, 'collector': run_collector, 'mudae': run_mudae}
+
+
+def run_suite(name: str, args, server: FixtureServer) -> Dict:
+    if args.real_limits:
+        limiter = HostRateLimiter()
+    else:
+        limiter = HostRateLimiter(limits={}, default=(1e6, 1e6))  # Measure the code, not the pacing
+
+    metrics.reset()
+    metrics.keep_samples = True
+    requests_before, errors_before = server.requests, server.injected_errors
+    if args.trace_memory:
+        tracemalloc.start()
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        characters = RUNNERS[name](args, server.base_url, limiter)
+    elapsed = time.perf_counter() - start
+
+    traced_peak = None
+    if args.trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    requests_made = metrics.total('http_requests_total')
+    return {
+        'suite': name,
+        'seconds': elapsed,
+        'characters': characters,
+        'characters_per_sec': characters / elapsed if elapsed else 0.0,
+        'requests': requests_made,
+        'requests_per_sec': requests_made / elapsed if elapsed else 0.0,
+        'server_requests': server.requests - requests_before,
+        'injected_errors': server.injected_errors - errors_before,
+        'phases': _latency_rows('phase_seconds', 'phase'),
+        'sources': _latency_rows('source_seconds', 'source'),
+        'hosts': _latency_rows('http_request_seconds', 'host'),
+        'traced_peak_bytes': traced_peak,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,  # Process-wide high-water mark
+    }
+
+
+def _latency_rows(metric: str, label: str) -> List[Dict]:
+    rows = []
+    for labels, count, (p50, p99) in metrics.quantiles(metric, (0.5, 0.99)):
+        name = labels.get(label, '')
+        if 'method' in labels:
+            name = f"{labels['method']} {name}"
+        rows.append({'name': name, 'count': count, 'p50': p50, 'p99': p99})
+    return rows
+
+
+def format_report(results: List[Dict], args) -> str:
+    lines = [
+        'Scraper benchmark',
+        f'  characters={args.characters} max_characters={args.max_characters} concurrent={args.concurrent} '
+        f'latency={args.latency}s jitter={args.jitter}s error_rate={args.error_rate} seed={args.seed}',
+    ]
+    for result in results:
+        lines.append('')
+        lines.append(f"[{result['suite']}] {result['seconds']:.2f}s  "
+                     f"{result['characters_per_sec']:.2f} characters/s  "
+                     f"{result['requests_per_sec']:.1f} requests/s  "
+                     f"({result['requests']:.0f} requests, {result['injected_errors']} injected errors)")
+        memory = f"  peak RSS {result['max_rss_kb'] / 1024:.1f} MiB"
+        if result['traced_peak_bytes'] is not None:
+            memory += f", traced Python peak {result['traced_peak_bytes'] / 1024 / 1024:.1f} MiB"
+        lines.append(memory)
+        for title, rows in (('phase', result['phases']), ('source', result['sources']), ('host', result['hosts'])):
+            for row in rows:
+                lines.append(f"  {title:<6} {row['name']:<32} n={row['count']:<6} "
+                             f"p50={row['p50'] * 1000:8.1f}ms  p99={row['p99'] * 1000:8.1f}ms")
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Offline scraper benchmark against a local fixture server')
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help='suite to run (repeatable; default: all)')
+    parser.add_argument('--characters', type=int, default=10, help='characters per batch suite')
+    parser.add_argument('--max-characters', type=int, default=1, help='characters processed at once')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='global request budget for batches')
+    parser.add_argument('--concurrent', action='store_true', help='query sources in parallel (advanced)')
+    parser.add_argument('--mudae-limit', type=int, default=500, help='characters to crawl in the mudae suite')
+    parser.add_argument('--window', type=int, default=8, help='search pages fetched at once (mudae)')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, uniform in [0, jitter]')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--seed', type=int, default=1, help='seed for latency jitter and error injection')
+    parser.add_argument('--real-limits', action='store_true', help='keep the production per-host rate limits')
+    parser.add_argument('--download', action='store_true', help='also download validated images (advanced)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also report the tracemalloc peak (slows the run)')
+    parser.add_argument('--output', help='also write the text report to this file')
+    parser.add_argument('--json', help='write the raw results as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the scrapers' own output")
+    parser.add_argument('--keep', action='store_true', help='keep the temporary working directory')
+    args = parser.parse_args(argv)
+
+    site = FixtureSite()
+    server = FixtureServer(site, args.latency, args.jitter, args.error_rate, args.seed).start()
+
+    # The collectors write their databases and images relative to the working directory
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='scraper-bench-')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(work_dir)
+    try:
+        results = [run_suite(name, args, server) for name in (args.suite or SUITES)]
+    finally:
+        os.chdir(original_dir)
+        server.stop()
+        if args.keep:
+            print(f'Working directory kept at {work_dir}')
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = format_report(results, args)
+    print(report, end='')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Character Database Snapshot
+Compact columnar export of the character database for the read-only card
+service. Every string (keys, names, URLs, paths, alt text) is stored once in
+a shared string table; image fields are parallel arrays (tier and source as
+small enum ids, scores and dimensions as numbers); fields without a column
+are kept as a JSON string per record, so export/import round-trips. The
+file is opened with mmap and columns are read in place, so opening it costs
+a header parse and only the records actually looked up are decoded.
+
+Layout (native byte order, recorded in the header):
+    header | column offsets | columns (8-byte aligned) | string offsets | string bytes
+Characters are sorted by key; each owns a contiguous run of images.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from character_store import character_key
+
+MAGIC = b'CHARSNAP'
+FORMAT_VERSION = 1
+# magic, version, little-endian flag, characters, images, strings, tiers, sources
+HEADER = struct.Struct('<8sIBxxxIIIII')
+
+ABSENT = 0xFFFFFFFF  # String id: field not present
+NULL = 0xFFFFFFFE  # String id: field present with value None
+INT_ABSENT = -2 ** 31
+INT_NULL = -2 ** 31 + 1
+SIZE_ABSENT = -2 ** 63
+ENUM_ABSENT = 0xFFFF
+
+# (column, array typecode); character columns hold one value per character,
+# image columns one per image, enum tables one string id per enum value
+CHARACTER_COLUMNS = (
+    ('char_key', 'I'), ('char_name', 'I'), ('char_series', 'I'), ('char_tiers', 'I'),
+    ('char_total', 'q'), ('char_first_image', 'I'), ('char_extra', 'I'),
+)
+IMAGE_COLUMNS = (
+    ('url', 'I'), ('page_url', 'I'), ('alt_text', 'I'), ('local_path', 'I'), ('sha256', 'I'),
+    ('content_type', 'I'), ('format', 'I'), ('content_length', 'I'),
+    ('tier', 'H'), ('source', 'H'), ('score_kind', 'B'), ('flags', 'B'), ('score', 'd'),
+    ('width', 'i'), ('height', 'i'), ('frames', 'i'), ('size', 'q'), ('image_extra', 'I'),
+)
+ENUM_COLUMNS = (('tier_names', 'I'), ('source_names', 'I'))
+COLUMNS = CHARACTER_COLUMNS + IMAGE_COLUMNS + ENUM_COLUMNS
+
+IMAGE_STRING_FIELDS = ('url', 'page_url', 'alt_text', 'local_path', 'sha256')
+VALIDATION_STRING_FIELDS = (('content_type', 'content_type'), ('format', 'format'), ('size', 'content_length'))
+VALIDATION_INT_FIELDS = ('width', 'height', 'frames')
+
+# score_kind values
+SCORE_ABSENT, SCORE_INT, SCORE_FLOAT = 0, 1, 2
+# flags bits
+HAS_VALIDATION, HAS_VALIDATED, VALIDATED_TRUE, HAS_TIER = 1, 2, 4, 8
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, value) -> int:
+        if value is None:
+            return NULL
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+
+def _align(f, boundary: int = 8):
+    padding = -f.tell() % boundary
+    if padding:
+        f.write(b'\0' * padding)
+
+
+def export_snapshot(records: Iterable[Tuple[str, Dict]], path: Path) -> int:
+    """
+    Write (key, record) pairs as a snapshot, atomically.
+    Accepts CharacterStore.items(), a dict's items() or any iterable of pairs.
+    Returns the number of characters written.
+    """
+    strings = _StringTable()
+    tiers, sources = {}, {}
+    columns = {name: array(code) for name, code in COLUMNS}
+    c = columns
+
+    for key, record in sorted(records, key=lambda item: item[0].encode('utf-8')):
+        record = dict(record)
+        images = record.pop('images', None)
+        c['char_key'].append(strings.add(key))
+        c['char_name'].append(strings.add(record.pop('name')) if 'name' in record else ABSENT)
+        c['char_series'].append(strings.add(record.pop('series')) if 'series' in record else ABSENT)
+        total = record.get('total_images')
+        if isinstance(total, int) and not isinstance(total, bool):
+            c['char_total'].append(record.pop('total_images'))
+        else:
+            c['char_total'].append(SIZE_ABSENT)
+        c['char_first_image'].append(len(c['url']))
+
+        if isinstance(images, dict):
+            c['char_tiers'].append(strings.add(json.dumps(list(images))))
+            for tier, tier_images in images.items():
+                tier_id = tiers.setdefault(tier, len(tiers))
+                for img in tier_images:
+                    _append_image(c, strings, sources, tier, tier_id, img)
+        else:
+            c['char_tiers'].append(ABSENT)
+            if images is not None:
+                record['images'] = images  # Unexpected shape: keep it verbatim
+        c['char_extra'].append(strings.add(json.dumps(record, ensure_ascii=False)) if record else ABSENT)
+
+    c['tier_names'].extend(strings.add(tier) for tier in tiers)
+    c['source_names'].extend(strings.add(source) for source in sources)
+
+    encoded = [s.encode('utf-8') for s in strings.strings]
+    string_offsets = array('Q', [0])
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, sys.byteorder == 'little',
+                            len(c['char_key']), len(c['url']), len(encoded), len(tiers), len(sources)))
+        table_at = f.tell()
+        f.write(b'\0' * 8 * (len(COLUMNS) + 2))  # Offsets, filled in below
+        offsets = []
+        for name, _ in COLUMNS:
+            _align(f)
+            offsets.append(f.tell())
+            columns[name].tofile(f)
+        _align(f)
+        offsets.append(f.tell())
+        string_offsets.tofile(f)
+        offsets.append(f.tell())
+        for data in encoded:
+            f.write(data)
+        f.seek(table_at)
+        f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+    os.replace(tmp_path, path)
+    return len(c['char_key'])
+
+
+def _append_image(c: Dict[str, array], strings: _StringTable, sources: Dict[str, int],
+                  tier: str, tier_id: int, img: Dict):
+    img = dict(img)
+    c['tier'].append(tier_id)
+    flags = 0
+    if 'tier' in img and img['tier'] == tier:
+        flags |= HAS_TIER  # Implied by the tier list the image is in
+        del img['tier']
+    source = img.pop('source', None)
+    c['source'].append(sources.setdefault(source, len(sources)) if isinstance(source, str) else ENUM_ABSENT)
+    if source is not None and not isinstance(source, str):
+        img['source'] = source
+
+    for field in IMAGE_STRING_FIELDS:
+        value = img.get(field, ...)
+        if value is ... or value is None or isinstance(value, str):
+            c[field].append(ABSENT if value is ... else strings.add(img.pop(field)))
+        else:
+            c[field].append(ABSENT)  # Not a string: stays in the extras
+
+    score = img.get('quality_score')
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or \
+            (isinstance(score, int) and abs(score) > 2 ** 53):
+        c['score_kind'].append(SCORE_ABSENT)
+        c['score'].append(0.0)
+    else:
+        c['score_kind'].append(SCORE_INT if isinstance(score, int) else SCORE_FLOAT)
+        c['score'].append(float(img.pop('quality_score')))
+
+    validated = img.get('validated')
+    if isinstance(validated, bool):
+        flags |= HAS_VALIDATED | (VALIDATED_TRUE if img.pop('validated') else 0)
+
+    validation = img.get('validation')
+    if isinstance(validation, dict):
+        flags |= HAS_VALIDATION
+        validation = dict(img.pop('validation'))
+        for field, column in VALIDATION_STRING_FIELDS:
+            value = validation.get(field, ...)
+            if value is ... or value is None or isinstance(value, str):
+                c[column].append(ABSENT if value is ... else strings.add(validation.pop(field)))
+            else:
+                c[column].append(ABSENT)
+        for field in VALIDATION_INT_FIELDS:
+            value = validation.get(field, ...)
+            if value is None:
+                c[field].append(INT_NULL)
+                del validation[field]
+            elif isinstance(value, int) and not isinstance(value, bool) and INT_NULL < value < 2 ** 31:
+                c[field].append(validation.pop(field))
+            else:
+                c[field].append(INT_ABSENT)
+        if validation:
+            img['_validation'] = validation  # Fields without a column
+    else:
+        for _, column in VALIDATION_STRING_FIELDS:
+            c[column].append(ABSENT)
+        for field in VALIDATION_INT_FIELDS:
+            c[field].append(INT_ABSENT)
+    c['flags'].append(flags)
+
+    size = img.get('size')
+    if isinstance(size, int) and not isinstance(size, bool) and size > SIZE_ABSENT:
+        c['size'].append(img.pop('size'))
+    else:
+        c['size'].append(SIZE_ABSENT)
+
+    c['image_extra'].append(strings.add(json.dumps(img, ensure_ascii=False)) if img else ABSENT)
+
+
+class _EncodedKeys:
+    """Sorted character keys as UTF-8 bytes, read from the mmap on demand (for bisect)"""
+
+    def __init__(self, snapshot: 'CharacterSnapshot'):
+        self.snapshot = snapshot
+        self.ids = snapshot.columns['char_key']
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.snapshot.string_bytes(self.ids[index])
+
+
+class CharacterSnapshot:
+    """
+    Read-only, mmap-backed view of a snapshot. Mapping-style access by key
+    decodes one record; tier_urls() / get_urls() read just the URL columns.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.file = open(self.path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, little_endian, character_count, self.image_count,
+         string_count, tier_count, source_count) = HEADER.unpack_from(self.mm, 0)
+        self.character_count = character_count
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} character snapshot")
+        if bool(little_endian) != (sys.byteorder == 'little'):
+            self.close()
+            raise ValueError(f"{self.path} was written on a machine with a different byte order")
+
+        offsets = struct.unpack_from(f'<{len(COLUMNS) + 2}Q', self.mm, HEADER.size)
+        counts = {name: character_count for name, _ in CHARACTER_COLUMNS}
+        counts.update((name, self.image_count) for name, _ in IMAGE_COLUMNS)
+        counts.update(tier_names=tier_count, source_names=source_count)
+        view = memoryview(self.mm)
+        self.columns = {}  # name -> memoryview cast to the column's type (zero-copy)
+        for (name, code), start in zip(COLUMNS, offsets):
+            self.columns[name] = view[start:start + struct.calcsize(code) * counts[name]].cast(code)
+        self._string_offsets = view[offsets[-2]:offsets[-2] + 8 * (string_count + 1)].cast('Q')
+        self._string_base = offsets[-1]
+        view.release()
+        self.tier_names = [self.string(i) for i in self.columns['tier_names']]
+        self.source_names = [self.string(i) for i in self.columns['source_names']]
+        self.tier_ids = {tier: i for i, tier in enumerate(self.tier_names)}
+
+    def string_bytes(self, string_id: int) -> bytes:
+        offsets = self._string_offsets
+        return self.mm[self._string_base + offsets[string_id]:self._string_base + offsets[string_id + 1]]
+
+    def string(self, string_id: int) -> Optional[str]:
+        return None if string_id == NULL else self.string_bytes(string_id).decode('utf-8')
+
+    # --- mapping access ----------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.character_count
+
+    def _find(self, key: str) -> Optional[int]:
+        keys = _EncodedKeys(self)
+        index = bisect_left(keys, key.encode('utf-8'))
+        if index < len(keys) and keys[index] == key.encode('utf-8'):
+            return index
+        return None
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.string(i) for i in self.columns['char_key'])
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        for index, string_id in enumerate(self.columns['char_key']):
+            yield self.string(string_id), self._record(index)
+
+    def get(self, key: str, default=None):
+        index = self._find(key)
+        return default if index is None else self._record(index)
+
+    def __getitem__(self, key: str) -> Dict:
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._record(index)
+
+    def _image_range(self, index: int) -> Tuple[int, int]:
+        first = self.columns['char_first_image']
+        end = first[index + 1] if index + 1 < self.character_count else self.image_count
+        return first[index], end
+
+    def _record(self, index: int) -> Dict:
+        c = self.columns
+        record = {}
+        if c['char_name'][index] != ABSENT:
+            record['name'] = self.string(c['char_name'][index])
+        if c['char_series'][index] != ABSENT:
+            record['series'] = self.string(c['char_series'][index])
+        if c['char_tiers'][index] != ABSENT:
+            images = {tier: [] for tier in json.loads(self.string(c['char_tiers'][index]))}
+            for i in range(*self._image_range(index)):
+                images[self.tier_names[c['tier'][i]]].append(self._image(i))
+            record['images'] = images
+        if c['char_total'][index] != SIZE_ABSENT:
+            record['total_images'] = c['char_total'][index]
+        if c['char_extra'][index] != ABSENT:
+            record.update(json.loads(self.string(c['char_extra'][index])))
+        return record
+
+    def _image(self, i: int) -> Dict:
+        c = self.columns
+        img = {}
+        for field in IMAGE_STRING_FIELDS:
+            if c[field][i] != ABSENT:
+                img[field] = self.string(c[field][i])
+        flags = c['flags'][i]
+        if flags & HAS_TIER:
+            img['tier'] = self.tier_names[c['tier'][i]]
+        if c['source'][i] != ENUM_ABSENT:
+            img['source'] = self.source_names[c['source'][i]]
+        kind = c['score_kind'][i]
+        if kind != SCORE_ABSENT:
+            img['quality_score'] = int(c['score'][i]) if kind == SCORE_INT else c['score'][i]
+        if flags & HAS_VALIDATED:
+            img['validated'] = bool(flags & VALIDATED_TRUE)
+        if c['size'][i] != SIZE_ABSENT:
+            img['size'] = c['size'][i]
+        extra = json.loads(self.string(c['image_extra'][i])) if c['image_extra'][i] != ABSENT else {}
+        if flags & HAS_VALIDATION:
+            validation = {}
+            for field, column in VALIDATION_STRING_FIELDS:
+                if c[column][i] != ABSENT:
+                    validation[field] = self.string(c[column][i])
+            for field in VALIDATION_INT_FIELDS:
+                value = c[field][i]
+                if value != INT_ABSENT:
+                    validation[field] = None if value == INT_NULL else value
+            validation.update(extra.pop('_validation', {}))
+            img['validation'] = validation
+        img.update(extra)
+        return img
+
+    # --- card service fast path -------------------------------------------
+
+    def tier_urls(self, key: str, tier: str) -> List[str]:
+        """Image URLs for one tier, like CharacterStore.tier_urls"""
+        index = self._find(key)
+        tier_id = self.tier_ids.get(tier)
+        if index is None or tier_id is None:
+            return []
+        c = self.columns
+        urls = []
+        for i in range(*self._image_range(index)):
+            if c['tier'][i] == tier_id:
+                urls.append(self.string(c['url'][i]))
+        return urls
+
+    def get_urls(self, character_name: str, series: str, tier: str = 'static') -> List[str]:
+        """Image URLs for a character tier (empty if unknown), like CardImageLookup.get_urls"""
+        return self.tier_urls(character_key(character_name, series), tier)
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Every record, decoded (the import half of export_snapshot)"""
+        return dict(self.items())
+
+    def close(self):
+        for column in getattr(self, 'columns', {}).values():
+            if isinstance(column, memoryview):
+                column.release()
+        self.columns = {}
+        if isinstance(getattr(self, '_string_offsets', None), memoryview):
+            self._string_offsets.release()
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Character Database Storage
+SQLite-backed, dict-like store for character records. Each assignment
+writes only that character's row in its own transaction, so save cost stays
+flat as the database grows and a crash never leaves a half-written file.
+Imports from and exports to the legacy character_database.json format
+and to the compact snapshot format read by the card service.
+A (key, tier) -> URL list index lets card generation read image URLs
+without loading whole records; CardImageLookup serves it read-only.
+Images downloaded into the ImageStore are indexed by their local path.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCHEMA_VERSION = 3  # 3: index holds remote URLs again (2 preferred downloaded local blobs)
+
+
+def character_key(character_name: str, series: str) -> str:
+    """Database key used for a character by both collectors"""
+    return f"{character_name}_{series}".replace(' ', '_').lower()
+
+
+def _tier_rows(key: str, value: Dict) -> List[Tuple[str, str, str]]:
+    """Index rows (key, tier, urls_json) for one character record"""
+    images = value.get('images', {}) if isinstance(value, dict) else {}
+    return [
+        (key, tier, json.dumps([img['url'] for img in tier_images], ensure_ascii=False))
+        for tier, tier_images in images.items()
+    ]
+
+
+class CharacterStore(MutableMapping):
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS characters ('
+            ' key TEXT PRIMARY KEY,'
+            ' data TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tier_urls ('
+            ' key TEXT NOT NULL,'
+            ' tier TEXT NOT NULL,'
+            ' urls TEXT NOT NULL,'
+            ' PRIMARY KEY (key, tier))'
+        )
+        self.conn.commit()
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            self.rebuild_index()
+
+        # One-time migration from the old full-rewrite JSON file
+        if legacy_json is not None and len(self) == 0 and Path(legacy_json).exists():
+            count = self.import_json(legacy_json)
+            print(f"Imported {count} characters from {legacy_json}")
+
+    def __getitem__(self, key: str) -> Dict:
+        with self.lock:
+            row = self.conn.execute('SELECT data FROM characters WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key: str, value: Dict):
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO characters (key, data, updated_at) VALUES (?, ?, ?)',
+                (key, data, time.time())
+            )
+            self.conn.execute('DELETE FROM tier_urls WHERE key = ?', (key,))
+            self.conn.executemany('INSERT INTO tier_urls VALUES (?, ?, ?)', _tier_rows(key, value))
+
+    def __delitem__(self, key: str):
+        with self.lock, self.conn:
+            cursor = self.conn.execute('DELETE FROM characters WHERE key = ?', (key,))
+            self.conn.execute('DELETE FROM tier_urls WHERE key = ?', (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            row = self.conn.execute('SELECT 1 FROM characters WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self.lock:
+            keys = [row[0] for row in self.conn.execute('SELECT key FROM characters ORDER BY key')]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM characters').fetchone()[0]
+
+    def names(self) -> List[Tuple[str, str, str]]:
+        """(key, name, series) of every record, without decoding whole records"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT key, json_extract(data, '$.name'), json_extract(data, '$.series') FROM characters"
+            ).fetchall()
+
+    def tier_urls(self, key: str, tier: str) -> List[str]:
+        """Image URLs for one tier, read from the index (local copies are in the records)"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT urls FROM tier_urls WHERE key = ? AND tier = ?', (key, tier)
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def rebuild_index(self):
+        """Regenerate the tier URL index from the stored records"""
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM tier_urls')
+            for key, data in self.conn.execute('SELECT key, data FROM characters').fetchall():
+                self.conn.executemany('INSERT INTO tier_urls VALUES (?, ?, ?)',
+                                      _tier_rows(key, json.loads(data)))
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def import_json(self, json_path: Path) -> int:
+        """Load records from a character_database.json file (one transaction)"""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        return self._import_records(records)
+
+    def import_snapshot(self, snapshot_path: Path) -> int:
+        """Load records from a snapshot written by export_snapshot (one transaction)"""
+        from character_snapshot import CharacterSnapshot
+        with CharacterSnapshot(snapshot_path) as snapshot:
+            return self._import_records(snapshot.to_dict())
+
+    def _import_records(self, records: Dict[str, Dict]) -> int:
+        now = time.time()
+        rows = [
+            (key, json.dumps(value, ensure_ascii=False, separators=(',', ':')), now)
+            for key, value in records.items()
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO characters (key, data, updated_at) VALUES (?, ?, ?)',
+                rows
+            )
+            for key, value in records.items():
+                self.conn.execute('DELETE FROM tier_urls WHERE key = ?', (key,))
+                self.conn.executemany('INSERT INTO tier_urls VALUES (?, ?, ?)', _tier_rows(key, value))
+        return len(rows)
+
+    def export_json(self, json_path: Path, indent: Optional[int] = 2):
+        """Write every record to a character_database.json file atomically"""
+        json_path = Path(json_path)
+        tmp_path = json_path.with_suffix('.tmp')
+        with self.lock:
+            rows = self.conn.execute('SELECT key, data FROM characters ORDER BY key').fetchall()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({key: json.loads(data) for key, data in rows}, f,
+                      indent=indent, ensure_ascii=False)
+        os.replace(tmp_path, json_path)
+
+    def export_snapshot(self, snapshot_path: Path) -> int:
+        """Write every record as a compact columnar snapshot (see character_snapshot) atomically"""
+        from character_snapshot import export_snapshot
+        with self.lock:
+            rows = self.conn.execute('SELECT key, data FROM characters').fetchall()
+        return export_snapshot(((key, json.loads(data)) for key, data in rows), snapshot_path)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CardImageLookup:
+    """
+    Read-only image URL lookup for processes that only render cards.
+    The database is opened on first use and recently served (key, tier)
+    pairs are kept in a bounded LRU. The cache is dropped whenever another
+    connection (e.g. a collector run) has committed since it was filled,
+    and unknown characters are not cached, so new ones show up at once.
+    """
+
+    def __init__(self, path: Path, cache_size: int = 1024):
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.conn = None
+        self.data_version = None  # PRAGMA data_version the cache was filled at
+        self.lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.conn is None and self.path.exists():
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        return self.conn
+
+    def get_urls(self, character_name: str, series: str, tier: str = 'static') -> List[str]:
+        """Image URLs for a character tier (empty if unknown)"""
+        cache_key = (character_key(character_name, series), tier)
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            # data_version changes when any other connection commits to the file
+            version = conn.execute('PRAGMA data_version').fetchone()[0]
+            if version != self.data_version:
+                self.cache.clear()
+                self.data_version = version
+            elif cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                return list(self.cache[cache_key])
+
+            row = conn.execute(
+                'SELECT urls FROM tier_urls WHERE key = ? AND tier = ?', cache_key
+            ).fetchone()
+            if row is None:
+                return []
+            urls = json.loads(row[0])
+
+            self.cache[cache_key] = urls
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return list(urls)
+
+    def clear(self):
+        """Forget cached lookups (commits by other connections already clear them)"""
+        with self.lock:
+            self.cache.clear()
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
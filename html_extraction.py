@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Streaming HTML Extraction
+Single-pass, tree-free extraction of the few tags each scraper needs.
+Sources declare Rules (tag + attribute filters, optionally scoped to a
+container element); extract() feeds the response bytes through the stdlib
+incremental HTMLParser and stops early once every limited rule is satisfied.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Pattern, Tuple, Union
+
+# Elements that never get an end tag
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+AttrFilter = Union[bool, str, Pattern, Callable[[Optional[str]], bool]]
+
+
+def _attr_matches(name: str, expected: AttrFilter, attrs: Dict[str, str]) -> bool:
+    value = attrs.get(name)
+    if expected is True:
+        return value is not None
+    if callable(expected) and not isinstance(expected, re.Pattern):
+        return bool(expected(value))
+    if value is None:
+        return False
+    if isinstance(expected, re.Pattern):
+        return expected.search(value) is not None
+    if name == 'class':
+        return expected in value.split()  # Same token semantics as BeautifulSoup class_
+    return value == expected
+
+
+def _element_matches(tag: str, attrs: Dict[str, str], spec_tag: str,
+                     spec_attrs: Optional[Dict[str, AttrFilter]]) -> bool:
+    if tag != spec_tag:
+        return False
+    return all(_attr_matches(name, expected, attrs) for name, expected in (spec_attrs or {}).items())
+
+
+class Rule:
+    """
+    Selector declared by a source.
+    tag/attrs: element to match; attribute filters are True (present), a string
+    (exact, or class token), a compiled regex (search) or a callable.
+    container: optional (tag, attrs) the element must be inside.
+    first: only the first match inside each container instance.
+    text: also capture the element's text content.
+    limit: stop collecting after this many matches.
+    Each match is a dict of the element's attributes, plus 'text' and the
+    container's ordinal as '_container' when requested.
+    """
+
+    def __init__(self, name: str, tag: str, attrs: Optional[Dict[str, AttrFilter]] = None,
+                 container: Optional[Tuple[str, Optional[Dict[str, AttrFilter]]]] = None,
+                 first: bool = False, text: bool = False, limit: Optional[int] = None):
+        self.name = name
+        self.tag = tag
+        self.attrs = attrs
+        self.container = container
+        self.first = first
+        self.text = text
+        self.limit = limit
+
+
+class _StreamingExtractor(HTMLParser):
+    def __init__(self, rules: List[Rule]):
+        super().__init__(convert_charrefs=True)
+        self.rules = rules
+        self.results = {rule.name: [] for rule in rules}
+        self.stack = []  # Open element tags
+        self.containers = {rule.name: [] for rule in rules}  # [depth, ordinal, matched]
+        self.container_counts = {rule.name: 0 for rule in rules}
+        self.capturing = []  # [depth, match dict, text parts]
+
+    def done(self) -> bool:
+        limited = [rule for rule in self.rules if rule.limit is not None]
+        return bool(limited) and len(limited) == len(self.rules) and all(
+            len(self.results[rule.name]) >= rule.limit for rule in limited
+        )
+
+    def handle_starttag(self, tag, attr_list):
+        attrs = {name: (value if value is not None else '') for name, value in attr_list}
+        depth = len(self.stack)
+
+        for rule in self.rules:
+            matches = self.results[rule.name]
+            if rule.limit is not None and len(matches) >= rule.limit:
+                continue
+
+            if rule.container is not None and _element_matches(tag, attrs, *rule.container):
+                self.container_counts[rule.name] += 1
+                if tag not in VOID_ELEMENTS:
+                    self.containers[rule.name].append([depth, self.container_counts[rule.name] - 1, False])
+                continue
+
+            if not _element_matches(tag, attrs, rule.tag, rule.attrs):
+                continue
+
+            match = dict(attrs)
+            if rule.container is not None:
+                open_containers = self.containers[rule.name]
+                if not open_containers:
+                    continue
+                current = open_containers[-1]
+                if rule.first and current[2]:
+                    continue
+                current[2] = True
+                match['_container'] = current[1]
+
+            matches.append(match)
+            if rule.text:
+                if tag in VOID_ELEMENTS:
+                    match['text'] = ''
+                else:
+                    self.capturing.append([depth, match, []])
+
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attr_list):
+        self.handle_starttag(tag, attr_list)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return  # Stray end tag
+        # Pop up to and including the most recent matching open tag
+        while self.stack:
+            popped = self.stack.pop()
+            depth = len(self.stack)
+            for open_containers in self.containers.values():
+                while open_containers and open_containers[-1][0] >= depth:
+                    open_containers.pop()
+            while self.capturing and self.capturing[-1][0] >= depth:
+                _, match, parts = self.capturing.pop()
+                match['text'] = ''.join(parts)
+            if popped == tag:
+                break
+
+    def handle_data(self, data):
+        for _, _, parts in self.capturing:
+            parts.append(data)
+
+    def finish(self) -> Dict[str, List[Dict]]:
+        for _, match, parts in self.capturing:
+            match['text'] = ''.join(parts)
+        self.capturing = []
+        return self.results
+
+
+def extract(content: Union[bytes, str], rules: List[Rule], chunk_size: int = 16 * 1024,
+            encoding: str = 'utf-8') -> Dict[str, List[Dict]]:
+    """
+    Run all rules over a document in one streaming pass.
+    Returns {rule.name: [match, ...]} in document order.
+    """
+    if isinstance(content, bytes):
+        content = content.decode(encoding, errors='replace')
+
+    parser = _StreamingExtractor(rules)
+    for start in range(0, len(content), chunk_size):
+        parser.feed(content[start:start + chunk_size])
+        if parser.done():
+            break
+    return parser.finish()
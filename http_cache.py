@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+HTTP Response Cache
+Disk cache for search and character pages, so re-scraping a character the
+same day is served from local disk. Entries are keyed on the normalized URL
+(lowercased scheme/host, default port and fragment dropped, query parameters
+merged and sorted) and live as long as Cache-Control / Expires allow, but
+never less than min_ttl. Bodies are stored zlib-compressed in SQLite; when
+the total exceeds max_bytes the least recently used entries are evicted.
+Expired entries with an ETag or Last-Modified are revalidated with a
+conditional request instead of being fetched again.
+"""
+
+import email.utils
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from http_transport import TransportResponse
+from metrics import metrics
+
+# send(extra_headers) -> response; extra_headers holds the conditional headers, if any
+Send = Callable[[Dict], object]
+
+# Response headers kept with a cached body (the body is stored decoded)
+KEPT_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control', 'expires', 'date')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str, params=None) -> str:
+    """Canonical form of url with params merged into its query string"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        for name, value in items:
+            if value is None:
+                continue  # requests drops None parameters too
+            values = value if isinstance(value, (list, tuple)) else [value]
+            query.extend((str(name), str(v)) for v in values)
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(sorted(query)), ''))
+
+
+def freshness_lifetime(headers, min_ttl: float, max_ttl: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds a response may be served from cache, or None if it must not be stored.
+    Uses s-maxage / max-age, then Expires; min_ttl is the floor either way.
+    """
+    directives = {}
+    for part in (headers.get('cache-control') or '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    if 'no-store' in directives:
+        return None
+
+    lifetime = 0.0
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            try:
+                lifetime = float(directives[name])
+            except ValueError:
+                continue
+            break
+    else:
+        if headers.get('expires'):
+            try:
+                expires = email.utils.parsedate_to_datetime(headers['expires']).timestamp()
+                lifetime = expires - time.time()
+            except (TypeError, ValueError):
+                pass
+
+    lifetime = max(lifetime, min_ttl)
+    if max_ttl is not None:
+        lifetime = min(lifetime, max_ttl)
+    return lifetime
+
+
+class HttpCache:
+    def __init__(self, path: Path, max_bytes: int = 256 * 1024 * 1024, min_ttl: float = 6 * 3600,
+                 max_ttl: Optional[float] = 7 * 24 * 3600, compression_level: int = 6):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' url TEXT NOT NULL,'
+            ' status INTEGER NOT NULL,'
+            ' headers TEXT NOT NULL,'
+            ' body BLOB NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _lookup(self, key: str) -> Optional[Tuple]:
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                'SELECT url, status, headers, body, expires_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        return row
+
+    @staticmethod
+    def _response(row: Tuple) -> TransportResponse:
+        url, status, headers, body, _ = row
+        return TransportResponse(status, json.loads(headers), zlib.decompress(body), url)
+
+    def store(self, key: str, response) -> bool:
+        """Cache a 200 response under key; returns False if its headers forbid storing"""
+        lifetime = freshness_lifetime(response.headers, self.min_ttl, self.max_ttl)
+        if response.status_code != 200 or lifetime is None:
+            return False
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        body = zlib.compress(response.content, self.compression_level)
+        now = time.time()
+        with self.lock, self.conn:
+            old = self.conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, str(response.url), response.status_code, json.dumps(headers), body,
+                 len(body), now + lifetime, now)
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self._evict()
+        return True
+
+    def _evict(self):
+        # Caller holds the lock and an open transaction
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9  # Leave headroom so eviction does not run on every store
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall():
+            if self.total_bytes <= target:
+                break
+            self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.total_bytes -= size
+
+    def _refresh(self, key: str, response):
+        """Extend an entry after a 304 Not Modified"""
+        lifetime = freshness_lifetime(response.headers, self.min_ttl, self.max_ttl)
+        with self.lock, self.conn:
+            if lifetime is None:
+                self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            else:
+                self.conn.execute('UPDATE responses SET expires_at = ? WHERE key = ?',
+                                  (time.time() + lifetime, key))
+
+    def fetch(self, url: str, send: Send, params=None):
+        """
+        Response for url (+params) from the cache if fresh; otherwise call
+        send(headers) with conditional headers for a stale entry and cache
+        the result.
+        """
+        key = normalize_url(url, params)
+        host = urlsplit(key).hostname or ''
+        row = self._lookup(key)
+        if row is not None and row[4] > time.time():
+            metrics.inc('http_cache_total', host=host, result='hit')
+            return self._response(row)
+
+        headers = {}
+        if row is not None:
+            cached_headers = json.loads(row[2])
+            if cached_headers.get('etag'):
+                headers['If-None-Match'] = cached_headers['etag']
+            if cached_headers.get('last-modified'):
+                headers['If-Modified-Since'] = cached_headers['last-modified']
+
+        response = send(headers)
+        if response.status_code == 304 and row is not None:
+            self._refresh(key, response)
+            metrics.inc('http_cache_total', host=host, result='revalidated')
+            return self._response(row)
+        self.store(key, response)
+        metrics.inc('http_cache_total', host=host, result='miss')
+        return response
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM responses')
+            self.total_bytes = 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
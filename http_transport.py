@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Async HTTP Transport
+Pooled keep-alive connections with shared timeout/retry settings for all
+scrapers. Uses httpx (optionally HTTP/2) when installed, otherwise a pooled
+requests.Session driven from a thread pool. Exposes coroutine methods for
+async callers and session-style get()/head()/post() for the existing sync code;
+the sync methods run on a private background event loop.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # Optional dependency
+    httpx = None
+
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+
+class TransportResponse:
+    """Minimal requests.Response look-alike returned by every engine"""
+
+    def __init__(self, status_code: int, headers, content: bytes, url: str, retries: int = 0):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.retries = retries  # Transport-level retries (not visible through httpx)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return requests.models.complexjson.loads(self.content)
+
+
+def read_prefix(response: requests.Response, length: int) -> TransportResponse:
+    """
+    At most the first length bytes of a streamed response, then close it, so
+    a server that ignores a Range header never sends the rest of the file.
+    """
+    content = bytearray()
+    try:
+        for chunk in response.iter_content(chunk_size=min(length, 64 * 1024)):
+            content += chunk
+            if len(content) >= length:
+                break
+    finally:
+        response.close()
+    return TransportResponse(response.status_code, response.headers, bytes(content[:length]), response.url)
+
+
+class AsyncTransport:
+    def __init__(self, pool_size: int = 100, per_host: int = 10, http2: bool = False,
+                 timeout: float = 10, retries: int = 2, headers: Optional[Dict] = None):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.http2 = http2
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = {'User-Agent': DEFAULT_USER_AGENT}
+        self.headers.update(headers or {})
+
+        self.engine = 'httpx' if httpx is not None else 'requests'
+        self._clients = {}  # httpx clients are bound to the event loop that created them
+        self._session = None
+        self._executor = None
+        self._loop = None
+        self._loop_thread = None
+        self._lock = threading.Lock()
+
+    # --- engines -------------------------------------------------------
+
+    def _httpx_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.pool_size,
+                                  max_keepalive_connections=self.pool_size)
+            try:
+                transport = httpx.AsyncHTTPTransport(retries=self.retries, http2=self.http2,
+                                                     limits=limits)
+            except ImportError:
+                print("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1")
+                transport = httpx.AsyncHTTPTransport(retries=self.retries, limits=limits)
+            client = self._clients[loop] = httpx.AsyncClient(
+                transport=transport, headers=self.headers, timeout=self.timeout
+            )
+        return client
+
+    def _requests_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                self._session = self._build_session()
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size)
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.per_host,
+            max_retries=Retry(total=self.retries, connect=self.retries, read=self.retries,
+                              backoff_factor=0.3, allowed_methods=['GET', 'HEAD'])
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    # --- async API -----------------------------------------------------
+
+    async def request(self, method: str, url: str, params=None, headers: Optional[Dict] = None,
+                      timeout: Optional[float] = None, json=None) -> TransportResponse:
+        timeout = self.timeout if timeout is None else timeout
+        follow = method.upper() != 'HEAD'  # Same redirect behaviour as requests
+
+        if self.engine == 'httpx':
+            response = await self._httpx_client().request(
+                method, url, params=params, headers=headers, json=json, timeout=timeout,
+                follow_redirects=follow
+            )
+            return TransportResponse(response.status_code, response.headers,
+                                     response.content, str(response.url))
+
+        session = self._requests_session()
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor,
+            lambda: session.request(method, url, params=params, headers=headers, json=json,
+                                    timeout=timeout, allow_redirects=follow)
+        )
+        raw_retries = getattr(response.raw, 'retries', None)
+        return TransportResponse(response.status_code, response.headers,
+                                 response.content, response.url,
+                                 len(raw_retries.history) if raw_retries else 0)
+
+    async def aget(self, url: str, **kwargs) -> TransportResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def ahead(self, url: str, **kwargs) -> TransportResponse:
+        return await self.request('HEAD', url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> TransportResponse:
+        return await self.request('POST', url, **kwargs)
+
+    # --- sync bridge (drop-in for requests.Session.get/head/post) --------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name='http-transport', daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def get(self, url: str, **kwargs) -> TransportResponse:
+        return self._run(self.aget(url, **kwargs))
+
+    def head(self, url: str, **kwargs) -> TransportResponse:
+        return self._run(self.ahead(url, **kwargs))
+
+    def post(self, url: str, **kwargs) -> TransportResponse:
+        return self._run(self.apost(url, **kwargs))
+
+    async def aclose(self):
+        """Close the httpx client bound to the running loop"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Release pooled connections and stop the bridge loop"""
+        if self._session is not None:
+            self._session.close()
+            self._executor.shutdown(wait=False)
+            self._session = None
+        if self._loop is not None:
+            self._run(self.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop = None
@@ -6,21 +6,44 @@ Supports 3 rarity tiers: Static, 3D, Animated
 """
 
 import requests
-import json
 import os
 import time
 import hashlib
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Iterator, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import re
+from character_store import CharacterStore, character_key
+from name_index import NameIndex
+from http_transport import AsyncTransport, TransportResponse, read_prefix
+from http_cache import HttpCache
+from image_pool import RandomImagePool
+from rate_limiter import HostRateLimiter, shared_limiter
+from resilience import Resilience, shared_resilience
+from batch_scheduler import BatchCheckpoint, BatchScheduler, aiterate
+from perceptual_dedup import PerceptualDeduplicator, PerceptualHashIndex
+from image_probe import probe_image, resolution_score
+from quality_scoring import TierBuckets
+from image_record import ImageRecord, from_dicts, to_dicts
+from metrics import metrics
+from image_validation import ValidationCache, iter_validate, validate_batch, validate_top_k, validate_with_cache
 
 class ImageCollector:
-    def __init__(self):
+    # Random-image categories drawn from for every character
+    WAIFU_PICS_CATEGORIES = ['waifu', 'neko', 'shinobu', 'megumin']
+    NEKOS_CATEGORIES = ['neko', 'waifu', 'kemonomimi']
+    
+    def __init__(self, rate_limiter: Optional[HostRateLimiter] = None,
+                 transport: Optional[AsyncTransport] = None,
+                 resilience: Optional[Resilience] = None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Pooled async engine if given, otherwise the plain blocking session
+        self.http = transport or self.session
         
         # Setup directories
         self.base_dir = Path("collected_images")
@@ -33,91 +56,145 @@ class ImageCollector:
         # Image validation settings
         self.min_size = 100  # Minimum image dimension
         self.max_file_size = 15 * 1024 * 1024  # 15MB max
-        
-    def load_database(self) -> Dict:
-        """Load existing character database"""
-        if self.character_db_path.exists():
-            with open(self.character_db_path, 'r') as f:
-                return json.load(f)
-        return {}
+        self.validation_workers = 8  # Concurrent HEAD requests
+        self.validation_time_budget = 90  # Seconds for a whole character
+        self.validation_cache = ValidationCache(
+            self.base_dir / "validation_cache.db", ttl=24 * 3600,
+            legacy_json=self.base_dir / "validation_cache.json"
+        )
+        self.images_per_tier = 250  # Versions kept per tier
+        self.probe_score_boost = 3  # Most a probed resolution can add to a score
+        
+        # Per-host token buckets (shared with AdvancedCharacterScraper by default)
+        self.rate_limiter = rate_limiter or shared_limiter
+        # Retries and per-host / per-source circuit breakers (shared with AdvancedCharacterScraper by default)
+        self.resilience = resilience or shared_resilience
+        self.request_budget = None  # Global in-flight cap, set by BatchScheduler
+        self.checkpoint = None  # BatchCheckpoint of the running batch, if any
+        self.perceptual_dedup = None  # See enable_perceptual_dedup()
+        
+        # Search API responses are re-used across runs (None disables)
+        self.http_cache = HttpCache(self.base_dir / "http_cache.db")
+        
+        # Random-image endpoints don't depend on the character: draw from a prefetched pool
+        self.image_pool = RandomImagePool(capacity=60)
+        for category in self.WAIFU_PICS_CATEGORIES:
+            self.image_pool.register(('waifu.pics', category), partial(self._fetch_waifu_pics, category))
+        for category in self.NEKOS_CATEGORIES:
+            self.image_pool.register(('nekos.life', category), partial(self._fetch_nekos, category), capacity=9)
+        
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET through the configured transport, rate limited per host, retried and circuit broken"""
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                return metrics.track_request('GET', url, lambda: self.http.get(url, **kwargs))
+        return self.resilience.request(url, attempt)
+    
+    def _get_page(self, url: str, params=None, **kwargs) -> requests.Response:
+        """GET a search result page, served from the HTTP cache while fresh"""
+        if self.http_cache is None:
+            return self._get(url, params=params, **kwargs)
+        return self.http_cache.fetch(
+            url, lambda headers: self._get(url, params=params, headers=headers or None, **kwargs), params
+        )
+    
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the configured transport, rate limited per host, retried and circuit broken"""
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                return metrics.track_request('POST', url, lambda: self.http.post(url, **kwargs))
+        return self.resilience.request(url, attempt)
+    
+    def _head(self, url: str, **kwargs) -> requests.Response:
+        """HEAD through the configured transport, rate limited per host, retried and circuit broken"""
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                return metrics.track_request('HEAD', url, lambda: self.http.head(url, **kwargs))
+        return self.resilience.request(url, attempt)
+    
+    def _get_range(self, url: str, length: int, timeout: float = 10, start: int = 0) -> TransportResponse:
+        """
+        Fetch only length bytes of url from offset start, rate limited, retried and circuit broken.
+        Streamed on the blocking session and cut off at length bytes, so a server
+        that ignores the Range and answers 200 does not send the whole image.
+        """
+        def attempt():
+            self.rate_limiter.acquire(url)
+            with self.request_budget or nullcontext():
+                response = metrics.track_request('GET', url, lambda: self.session.get(
+                    url, headers={'Range': f'bytes={start}-{start + length - 1}'}, stream=True, timeout=timeout),
+                    read_body=False)
+                response = read_prefix(response, length)
+            metrics.inc('http_response_bytes_total', len(response.content), host=urlparse(url).hostname or '')
+            return response
+        return self.resilience.request(url, attempt)
+    
+    def enable_perceptual_dedup(self, threshold: int = 6) -> bool:
+        """Turn on content-aware deduplication (needs Pillow)"""
+        try:
+            index = PerceptualHashIndex(self.base_dir / "image_hashes.jsonl", threshold=threshold)
+            self.perceptual_dedup = PerceptualDeduplicator(index, self._get_range, max_bytes=self.max_file_size)
+            return True
+        except ImportError as e:
+            print(f"Perceptual dedup unavailable: {e}")
+            return False
+    
+    def load_database(self) -> CharacterStore:
+        """Open character database (imports character_database.json on first run)"""
+        return CharacterStore(
+            self.base_dir / "character_database.db",
+            legacy_json=self.character_db_path
+        )
     
     def save_database(self):
-        """Save character database"""
-        with open(self.character_db_path, 'w') as f:
-            json.dump(self.character_db, f, indent=2)
+        """Export character database to character_database.json and the card service snapshot"""
+        # Records are persisted as they are assigned; this is only for JSON and snapshot consumers
+        self.character_db.export_json(self.character_db_path)
+        self.character_db.export_snapshot(self.character_db_path.with_suffix('.snap'))
+    
+    def _fetch_waifu_pics(self, category: str) -> List[str]:
+        """Image URLs from one waifu.pics call (bulk endpoint, single-image fallback)"""
+        response = self._post(f"https://api.waifu.pics/many/sfw/{category}", json={'exclude': []}, timeout=10)
+        if response.status_code == 200:
+            return response.json().get('files', [])
+        response = self._get(f"https://api.waifu.pics/sfw/{category}", timeout=10)
+        if response.status_code == 200:
+            return [response.json().get('url')]
+        return []
     
-    def get_waifu_pics_images(self, character_name: str, series: str) -> List[Dict]:
-        """Get images from waifu.pics API"""
+    def _fetch_nekos(self, category: str) -> List[str]:
+        """Image URL from one nekos.life call (the API has no bulk endpoint)"""
+        response = self._get(f"https://nekos.life/api/v2/img/{category}", timeout=10)
+        if response.status_code == 200:
+            return [response.json().get('url')]
+        return []
+    
+    def get_waifu_pics_images(self, character_name: str, series: str) -> List[ImageRecord]:
+        """Get images from waifu.pics API (drawn from the prefetched pool)"""
         images = []
         
-        try:
-            # waifu.pics has SFW anime images
-            endpoints = [
-                'https://api.waifu.pics/sfw/waifu',
-                'https://api.waifu.pics/sfw/neko',
-                'https://api.waifu.pics/sfw/shinobu',
-                'https://api.waifu.pics/sfw/megumin'
-            ]
-            
-            for endpoint in endpoints:
-                for _ in range(5):  # Get 5 images from each endpoint
-                    try:
-                        response = self.session.get(endpoint, timeout=10)
-                        if response.status_code == 200:
-                            data = response.json()
-                            if 'url' in data:
-                                images.append({
-                                    'url': data['url'],
-                                    'tier': 'static',
-                                    'source': 'waifu.pics',
-                                    'quality_score': 6,
-                                    'validated': False
-                                })
-                        time.sleep(0.2)  # Rate limiting
-                    except:
-                        continue
-                        
-        except Exception as e:
-            print(f"Error with waifu.pics: {e}")
+        # waifu.pics has SFW anime images; 5 from each category
+        for category in self.WAIFU_PICS_CATEGORIES:
+            for url in self.image_pool.take(('waifu.pics', category), 5):
+                images.append(ImageRecord(url, 'static', 'waifu.pics', 6, validated=False))
         
         return images
     
-    def get_nekos_api_images(self, character_name: str, series: str) -> List[Dict]:
-        """Get images from nekos.life API"""
+    def get_nekos_api_images(self, character_name: str, series: str) -> List[ImageRecord]:
+        """Get images from nekos.life API (drawn from the prefetched pool)"""
         images = []
         
-        try:
-            # nekos.life endpoints
-            endpoints = [
-                'https://nekos.life/api/v2/img/neko',
-                'https://nekos.life/api/v2/img/waifu',
-                'https://nekos.life/api/v2/img/kemonomimi'
-            ]
-            
-            for endpoint in endpoints:
-                for _ in range(3):  # Get 3 from each
-                    try:
-                        response = self.session.get(endpoint, timeout=10)
-                        if response.status_code == 200:
-                            data = response.json()
-                            if 'url' in data:
-                                images.append({
-                                    'url': data['url'],
-                                    'tier': 'static',
-                                    'source': 'nekos.life',
-                                    'quality_score': 5,
-                                    'validated': False
-                                })
-                        time.sleep(0.3)
-                    except:
-                        continue
-                        
-        except Exception as e:
-            print(f"Error with nekos.life: {e}")
+        # 3 from each nekos.life category
+        for category in self.NEKOS_CATEGORIES:
+            for url in self.image_pool.take(('nekos.life', category), 3):
+                images.append(ImageRecord(url, 'static', 'nekos.life', 5, validated=False))
         
         return images
     
-    def get_waifu_im_images(self, character_name: str, series: str) -> List[Dict]:
+    def get_waifu_im_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """Get images from waifu.im API"""
         images = []
         
@@ -143,20 +220,16 @@ class ImageCollector:
                         'limit': 10
                     }
                     
-                    response = self.session.get(url, params=params, timeout=10)
+                    response = self._get(url, params=params, timeout=10)
                     if response.status_code == 200:
                         data = response.json()
                         if 'images' in data:
                             for img in data['images']:
-                                images.append({
-                                    'url': img['url'],
-                                    'tier': 'static',
-                                    'source': 'waifu.im',
-                                    'quality_score': 7,
-                                    'validated': False,
-                                    'tags': img.get('tags', [])
-                                })
-                    time.sleep(0.5)
+                                images.append(ImageRecord(
+                                    img['url'], 'static', 'waifu.im', 7,
+                                    validated=False,
+                                    tags=img.get('tags', [])
+                                ))
                 except:
                     continue
                     
@@ -165,7 +238,7 @@ class ImageCollector:
         
         return images
     
-    def get_reddit_images(self, character_name: str, series: str) -> List[Dict]:
+    def get_reddit_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """Get images from Reddit using pushshift"""
         images = []
         
@@ -199,7 +272,7 @@ class ImageCollector:
                             'fields': 'url,title,score'
                         }
                         
-                        response = self.session.get(url, params=params, timeout=10)
+                        response = self._get_page(url, params=params, timeout=10)
                         if response.status_code == 200:
                             data = response.json()
                             if 'data' in data:
@@ -209,15 +282,12 @@ class ImageCollector:
                                         
                                         tier = 'animated' if post_url.lower().endswith('.gif') else 'static'
                                         
-                                        images.append({
-                                            'url': post_url,
-                                            'tier': tier,
-                                            'source': f'reddit/{subreddit}',
-                                            'quality_score': min(10, int(post.get('score', 0) / 100) + 4),
-                                            'validated': False,
-                                            'title': post.get('title', '')
-                                        })
-                        time.sleep(0.5)
+                                        images.append(ImageRecord(
+                                            post_url, tier, f'reddit/{subreddit}',
+                                            min(10, int(post.get('score', 0) / 100) + 4),
+                                            validated=False,
+                                            title=post.get('title', '')
+                                        ))
                     except:
                         continue
                         
@@ -226,7 +296,7 @@ class ImageCollector:
         
         return images
     
-    def get_danbooru_images(self, character_name: str, series: str) -> List[Dict]:
+    def get_danbooru_images(self, character_name: str, series: str) -> List[ImageRecord]:
         """Get images from Danbooru (SFW only)"""
         images = []
         
@@ -252,7 +322,7 @@ class ImageCollector:
                         'random': 'true'
                     }
                     
-                    response = self.session.get(base_url, params=params, timeout=10)
+                    response = self._get_page(base_url, params=params, timeout=10)
                     if response.status_code == 200:
                         posts = response.json()
                         
@@ -268,16 +338,12 @@ class ImageCollector:
                                         for keyword in ['3d', 'render', 'cg']):
                                     tier = '3d'
                                 
-                                images.append({
-                                    'url': file_url,
-                                    'tier': tier,
-                                    'source': 'danbooru',
-                                    'quality_score': min(10, int(post.get('score', 0) / 10) + 5),
-                                    'validated': False,
-                                    'tags': post.get('tag_string', '').split()
-                                })
-                    
-                    time.sleep(1)  # Danbooru rate limiting
+                                images.append(ImageRecord(
+                                    file_url, tier, 'danbooru',
+                                    min(10, int(post.get('score', 0) / 10) + 5),
+                                    validated=False,
+                                    tags=post.get('tag_string', '').split()
+                                ))
                 except:
                     continue
                     
@@ -289,43 +355,112 @@ class ImageCollector:
     def validate_image_url(self, url: str) -> Tuple[bool, Dict]:
         """Validate if image URL is accessible and meets quality standards"""
         try:
-            # HEAD request to check without downloading
-            response = self.session.head(url, timeout=10)
-            
-            if response.status_code != 200:
-                return False, {'error': f'HTTP {response.status_code}'}
-            
-            # Check content type
-            content_type = response.headers.get('content-type', '').lower()
-            if not any(img_type in content_type for img_type in ['image/', 'gif']):
-                return False, {'error': 'Invalid content type'}
-            
-            # Check file size
-            content_length = response.headers.get('content-length')
-            if content_length:
-                size = int(content_length)
-                if size > self.max_file_size:
-                    return False, {'error': 'File too large'}
-                if size < 1000:  # Less than 1KB probably broken
-                    return False, {'error': 'File too small'}
-            
-            return True, {
-                'content_type': content_type,
-                'size': content_length,
-                'status': 'valid'
-            }
-            
+            # HEAD request to check without downloading (skipped while cached)
+            return validate_with_cache(
+                self.validation_cache, url,
+                lambda url, headers: self._head(url, headers=headers, timeout=10),
+                self.check_image_response
+            )
         except Exception as e:
             return False, {'error': str(e)}
     
-    def collect_character_images(self, character_name: str, series: str) -> Dict:
-        """Collect images for a character from all sources"""
+    def check_image_response(self, response: requests.Response) -> Tuple[bool, Dict]:
+        """Judge a HEAD response against the quality standards"""
+        if response.status_code != 200:
+            return False, {'error': f'HTTP {response.status_code}'}
+        
+        # Check content type
+        content_type = response.headers.get('content-type', '').lower()
+        if not any(img_type in content_type for img_type in ['image/', 'gif']):
+            return False, {'error': 'Invalid content type'}
+        
+        # Check file size
+        content_length = response.headers.get('content-length')
+        if content_length:
+            size = int(content_length)
+            if size > self.max_file_size:
+                return False, {'error': 'File too large'}
+            if size < 1000:  # Less than 1KB probably broken
+                return False, {'error': 'File too small'}
+        
+        info = {
+            'content_type': content_type,
+            'size': content_length,
+            'status': 'valid'
+        }
         
-        print(f"Collecting images for: {character_name} from {series}")
+        # Real dimensions from the first few KB (unknown formats pass unchecked; a failed
+        # probe raises ProbeError, so the result is reported as an error and never cached)
+        header = probe_image(response.url, self._get_range)
+        if header:
+            info.update(header)
+            if min(header['width'], header['height']) < self.min_size:
+                return False, {'error': f"Image too small ({header['width']}x{header['height']})", **header}
         
-        all_images = []
+        return True, info
+    
+    def apply_probe_score(self, img_data: Dict, validation_info: Dict):
+        """Adjust a source's fixed score by the probed resolution"""
+        if 'width' in validation_info:
+            img_data['quality_score'] = max(1, img_data['quality_score'] + resolution_score(validation_info))
+    
+    def validate_images(self, unique_images: Dict[str, Dict], max_workers: Optional[int] = None,
+                        time_budget: Optional[float] = None) -> List[Tuple[Dict, bool, Dict]]:
+        """
+        Validate deduplicated images concurrently
+        Returns (img_data, is_valid, validation_info) in quality score order
+        """
+        results = validate_batch(
+            unique_images, self.validate_image_url,
+            max_workers=max_workers or self.validation_workers,
+            time_budget=time_budget if time_budget is not None else self.validation_time_budget
+        )
+        self.validation_cache.save()
+        return results
+    
+    def new_tier_buckets(self) -> TierBuckets:
+        return TierBuckets(self.images_per_tier, max_boost=self.probe_score_boost)
+    
+    def _accept_image(self, img_data: Dict, validation_info: Dict):
+        img_data['validation'] = validation_info
+        self.apply_probe_score(img_data, validation_info)
+        img_data['validated'] = True
+    
+    def validate_into_buckets(self, unique_images: Dict[str, Dict], buckets: TierBuckets) -> List[Tuple[Dict, bool, Dict]]:
+        """
+        Validate best-first into per-tier top-k buckets; candidates that can no
+        longer make their tier are never requested
+        """
+        results = validate_top_k(
+            unique_images, self.validate_image_url, buckets, self._accept_image,
+            max_workers=self.validation_workers, time_budget=self.validation_time_budget
+        )
+        self.validation_cache.save()
+        return results
+    
+    def _run_source(self, source_func, character_name: str, series: str) -> List[ImageRecord]:
+        """Run one image source (timed), reusing results journaled before a restart"""
+        source = source_func.__name__
+        if self.checkpoint is not None:
+            images = self.checkpoint.source_images(character_name, series, source)
+            if images is not None:
+                return from_dicts(images)
         
-        # Collect from all sources
+        try:
+            with self.resilience.source(source) as call, metrics.timer('source_seconds', source=source):
+                images = source_func(character_name, series)
+        except Exception:
+            metrics.inc('source_errors_total', source=source)
+            raise
+        metrics.inc('source_images_total', len(images), source=source)
+        
+        # Don't journal a source whose requests all failed; a resumed batch retries it
+        if self.checkpoint is not None and not call.all_failed:
+            self.checkpoint.record_source(character_name, series, source, to_dicts(images))
+        return images
+    
+    def iter_source_images(self, character_name: str, series: str) -> Iterator[Dict]:
+        """Run the sources one by one, yielding each new (not yet seen) image as it arrives"""
         collectors = [
             self.get_waifu_pics_images,
             self.get_nekos_api_images,
@@ -334,62 +469,34 @@ class ImageCollector:
             self.get_danbooru_images
         ]
         
+        seen = set()
         for collector in collectors:
             try:
                 print(f"  Trying {collector.__name__}...")
-                source_images = collector(character_name, series)
-                all_images.extend(source_images)
+                source_images = self._run_source(collector, character_name, series)
                 print(f"    Found {len(source_images)} images")
-                time.sleep(1)  # Rate limiting between sources
             except Exception as e:
                 print(f"    Error: {e}")
                 continue
-        
-        # Remove duplicates
-        unique_images = {}
-        for img in all_images:
-            url_hash = hashlib.md5(img['url'].encode()).hexdigest()
-            if url_hash not in unique_images:
-                unique_images[url_hash] = img
-        
-        # Validate images
-        validated_images = []
-        print(f"  Validating {len(unique_images)} unique images...")
-        
-        for img_data in unique_images.values():
-            is_valid, validation_info = self.validate_image_url(img_data['url'])
-            if is_valid:
-                img_data['validation'] = validation_info
-                img_data['validated'] = True
-                validated_images.append(img_data)
-            else:
-                print(f"    Invalid: {validation_info.get('error', 'Unknown error')}")
-        
-        # Sort by quality score
-        validated_images.sort(key=lambda x: x['quality_score'], reverse=True)
-        
-        # Organize by tier
-        organized_images = {
-            'static': [],
-            '3d': [],
-            'animated': []
-        }
-        
-        for img in validated_images:
-            tier = img['tier']
-            if tier in organized_images:
-                organized_images[tier].append(img)
-        
-        # Limit to 250 per tier (for versioning system)
-        for tier in organized_images:
-            organized_images[tier] = organized_images[tier][:250]
+            
+            for img in source_images:
+                url_hash = hashlib.md5(img['url'].encode()).hexdigest()
+                if url_hash not in seen:
+                    seen.add(url_hash)
+                    yield img
+    
+    def _finish_character(self, character_name: str, series: str, buckets: TierBuckets) -> Dict:
+        """Save the best validated images per tier as the character entry"""
+        # Organized by tier, best 250 per tier (for versioning system)
+        with metrics.timer('phase_seconds', phase='organize'):
+            organized_images = {tier: to_dicts(tier_images) for tier, tier_images in buckets.ranked().items()}
         
         # Create character entry
         character_data = {
             'name': character_name,
             'series': series,
             'images': organized_images,
-            'total_images': len(validated_images),
+            'total_images': buckets.accepted,
             'versions': {
                 'static': len(organized_images['static']),
                 '3d': len(organized_images['3d']),
@@ -398,48 +505,164 @@ class ImageCollector:
             'last_updated': time.strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        # Save to database
-        char_key = f"{character_name}_{series}".replace(' ', '_').lower()
-        self.character_db[char_key] = character_data
-        self.save_database()
+        # Save to database (writes only this character's record)
+        with metrics.timer('phase_seconds', phase='save'):
+            self.character_db[character_key(character_name, series)] = character_data
         
-        print(f"✓ Collected {len(validated_images)} valid images")
+        print(f"✓ Collected {buckets.accepted} valid images")
         print(f"  - Static: {len(organized_images['static'])}")
         print(f"  - 3D: {len(organized_images['3d'])}")
         print(f"  - Animated: {len(organized_images['animated'])}")
         
         return character_data
     
-    def batch_collect(self, character_list: List[Tuple[str, str]]) -> Dict:
-        """Batch collect images for multiple characters"""
-        results = {}
+    def collect_character_images(self, character_name: str, series: str) -> Dict:
+        """Collect images for a character from all sources"""
         
-        for i, (char_name, series) in enumerate(character_list):
-            print(f"\n[{i+1}/{len(character_list)}] Processing: {char_name}")
-            
-            try:
-                char_data = self.collect_character_images(char_name, series)
-                results[char_name] = char_data
-                
-                # Delay between characters
-                time.sleep(2)
+        print(f"Collecting images for: {character_name} from {series}")
+        
+        # Collect from all sources, removing duplicate URLs
+        with metrics.timer('phase_seconds', phase='collect'):
+            unique_images = {
+                hashlib.md5(img['url'].encode()).hexdigest(): img
+                for img in self.iter_source_images(character_name, series)
+            }
+        
+        # Optionally drop the same artwork served under different URLs
+        char_key = character_key(character_name, series)
+        if self.perceptual_dedup:
+            with metrics.timer('phase_seconds', phase='dedup'):
+                unique_images = self.perceptual_dedup.filter(unique_images, char_key)
+        
+        # Validate images best-first, keeping the top images of each tier
+        buckets = self.new_tier_buckets()
+        print(f"  Validating {len(unique_images)} unique images...")
+        
+        with metrics.timer('phase_seconds', phase='validate'):
+            validation_results = self.validate_into_buckets(unique_images, buckets)
+        for img_data, is_valid, validation_info in validation_results:
+            if not is_valid:
+                print(f"    Invalid: {validation_info.get('error', 'Unknown error')}")
+        
+        if self.perceptual_dedup:
+            self.perceptual_dedup.remember(list(buckets), char_key)
+        
+        return self._finish_character(character_name, series, buckets)
+    
+    def stream_character_images(self, character_name: str, series: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        Streaming version of collect_character_images.
+        Images are validated while later sources are still being queried;
+        yields ('image', img_data) for each valid image that enters its tier's
+        top list as it is confirmed and finally ('character', character_data). Perceptual dedup needs the whole
+        candidate set, so it only runs in collect_character_images.
+        """
+        print(f"Streaming images for: {character_name} from {series}")
+        
+        buckets = self.new_tier_buckets()
+        for img_data, is_valid, validation_info in iter_validate(
+                self.iter_source_images(character_name, series), self.validate_image_url,
+                max_workers=self.validation_workers, time_budget=self.validation_time_budget,
+                should_validate=buckets.could_accept):
+            if is_valid:
+                self._accept_image(img_data, validation_info)
+                if buckets.offer(img_data):
+                    yield 'image', img_data.to_dict()
+            else:
+                print(f"    Invalid: {validation_info.get('error', 'Unknown error')}")
+        self.validation_cache.save()
+        
+        yield 'character', self._finish_character(character_name, series, buckets)
+    
+    async def astream_character_images(self, character_name: str, series: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """Async-iterator version of stream_character_images"""
+        async for event in aiterate(lambda: self.stream_character_images(character_name, series)):
+            yield event
+    
+    def iter_collect(self, character_list: List[Tuple[str, str]], max_characters: int = 4,
+                     max_in_flight: int = 64) -> Iterator[Tuple[str, Dict]]:
+        """Collect characters concurrently, yielding (name, character_data) as each finishes"""
+        self.image_pool.prefetch()  # Fill the random-image reservoirs while the first sources run
+        scheduler = BatchScheduler(max_characters, max_in_flight, self.rate_limiter)
+        scheduler.attach(self)
+        try:
+            for char_name, series, char_data in scheduler.iter_run(character_list,
+                                                                   self.collect_character_images):
+                yield char_name, char_data
+        finally:
+            self.request_budget = None
+    
+    async def aiter_collect(self, character_list: List[Tuple[str, str]], max_characters: int = 4,
+                            max_in_flight: int = 64) -> AsyncIterator[Tuple[str, Dict]]:
+        """Async-iterator version of iter_collect"""
+        async for item in aiterate(lambda: self.iter_collect(character_list, max_characters, max_in_flight)):
+            yield item
+    
+    def known_characters(self, character_list: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Name -> database key for characters already collected, matched by exact normalized name and series"""
+        index = NameIndex.build(self.character_db, anilist_cache=None, versions=None)
+        known = {}
+        for char_name, series in character_list:
+            key = index.resolve(char_name, series, source='database')
+            if key is not None:
+                known[char_name] = key
+        return known
+    
+    def batch_collect(self, character_list: List[Tuple[str, str]], max_characters: int = 1,
+                      max_in_flight: int = 64, checkpoint_path: Optional[str] = None,
+                      skip_existing: bool = False) -> Dict:
+        """
+        Batch collect images for multiple characters (max_characters at once)
+        checkpoint_path: journal that lets an interrupted batch resume where it stopped
+        skip_existing: don't scrape characters already in the database (case, accents and punctuation ignored)
+        """
+        known = self.known_characters(character_list) if skip_existing else {}
+        if known:
+            print(f"Skipping {len(known)} characters already in the database")
+        to_scrape = [(char_name, series) for char_name, series in character_list if char_name not in known]
+        
+        self.checkpoint = BatchCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.image_pool.prefetch()  # Fill the random-image reservoirs while the first sources run
+        try:
+            if max_characters > 1:
+                scheduler = BatchScheduler(max_characters, max_in_flight, self.rate_limiter)
+                scheduler.attach(self)
+                results = scheduler.run(to_scrape, self.collect_character_images,
+                                        checkpoint=self.checkpoint)
+            else:
+                results = {}
+                pending = self.checkpoint.pending(to_scrape) if self.checkpoint else to_scrape
                 
-            except Exception as e:
-                print(f"Error processing {char_name}: {e}")
-                results[char_name] = {'error': str(e)}
+                for i, (char_name, series) in enumerate(pending):
+                    print(f"\n[{i+1}/{len(pending)}] Processing: {char_name}")
+                    
+                    try:
+                        char_data = self.collect_character_images(char_name, series)
+                        results[char_name] = char_data
+                        
+                    except Exception as e:
+                        print(f"Error processing {char_name}: {e}")
+                        results[char_name] = {'error': str(e)}
+                    
+                    if self.checkpoint:
+                        self.checkpoint.record_result(char_name, series, results[char_name])
+        finally:
+            self.request_budget = None
+            if self.checkpoint:
+                self.checkpoint.close()
+                self.checkpoint = None
+        
+        # Characters finished by an earlier run (or skipped as known) come from the database
+        for char_name, series in character_list:
+            if char_name not in results:
+                results[char_name] = self.character_db.get(
+                    known.get(char_name) or character_key(char_name, series), {'error': 'Not found in database'})
         
         return results
     
     def get_character_images_for_cards(self, character_name: str, series: str, tier: str = 'static') -> List[str]:
-        """Get image URLs for card generation"""
-        char_key = f"{character_name}_{series}".replace(' ', '_').lower()
-        
-        if char_key in self.character_db:
-            char_data = self.character_db[char_key]
-            tier_images = char_data.get('images', {}).get(tier, [])
-            return [img['url'] for img in tier_images]
-        
-        return []
+        """Get image URLs for card generation (see CardImageLookup for read-only processes)"""
+        return self.character_db.tier_urls(character_key(character_name, series), tier)
 
 # Test the collector
 if __name__ == "__main__":
@@ -454,6 +677,10 @@ if __name__ == "__main__":
     
     print("Starting image collection...")
     results = collector.batch_collect(test_chars)
+    collector.save_database()  # Refresh the JSON export once per batch
+    metrics.write(collector.base_dir / "metrics.prom")  # Prometheus text; use a .json path for JSON
+    print("\nTime breakdown:")
+    print(metrics.summary())
     
     print("\n=== COLLECTION COMPLETE ===")
     for char_name, result in results.items():
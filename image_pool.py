@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Random Image Pool
+Reservoirs of image URLs for random-image endpoints (waifu.pics, nekos.life)
+whose results do not depend on the character being collected. Background
+workers keep each (endpoint, tag) reservoir topped up, using bulk endpoints
+where the API has one, so collectors draw URLs instantly instead of making
+one round trip per image. URLs are deduplicated against everything the
+pool has seen recently, so characters do not share the same random images.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Iterable, List, Optional
+
+# fetch() -> image URLs from one API call (one for single-image endpoints, many for bulk ones)
+Fetch = Callable[[], List[str]]
+
+
+class RandomImagePool:
+    def __init__(self, capacity: int = 60, workers: int = 2, history: int = 5000,
+                 max_stale_fetches: int = 3):
+        self.capacity = capacity  # Default reservoir size; refills start below half of it
+        self.history = history
+        self.max_stale_fetches = max_stale_fetches  # Fetches in a row that bring nothing new
+        self.workers = workers
+        self.fetchers = {}  # key -> Fetch
+        self.capacities = {}  # key -> reservoir size
+        self.reservoirs = {}  # key -> deque of URLs ready to hand out
+        self.seen = {}  # key -> (set, deque) of recent URLs, bounded by history
+        self.filling = set()
+        self.executor = None
+        self.cond = threading.Condition()
+
+    def register(self, key: Hashable, fetch: Fetch, capacity: Optional[int] = None):
+        """
+        Add an endpoint; filling starts on the first take() or prefetch().
+        Keep capacity small for single-image endpoints: every slot is a request.
+        """
+        with self.cond:
+            self.fetchers[key] = fetch
+            self.capacities[key] = self.capacity if capacity is None else capacity
+            self.reservoirs[key] = deque()
+            self.seen[key] = (set(), deque())
+
+    def _schedule(self, key: Hashable):
+        # Caller holds the condition's lock
+        if key in self.filling or len(self.reservoirs[key]) >= self.capacities[key] // 2:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-pool')
+        self.filling.add(key)
+        self.executor.submit(self._fill, key)
+
+    def _add(self, key: Hashable, urls: Iterable[str]) -> int:
+        # Caller holds the condition's lock
+        seen, order = self.seen[key]
+        reservoir = self.reservoirs[key]
+        added = 0
+        for url in urls:
+            if not url or url in seen or len(reservoir) >= self.capacities[key]:
+                continue
+            seen.add(url)
+            order.append(url)
+            if len(order) > self.history:
+                seen.discard(order.popleft())
+            reservoir.append(url)
+            added += 1
+        return added
+
+    def _fill(self, key: Hashable):
+        stale = 0
+        try:
+            while stale < self.max_stale_fetches:
+                with self.cond:
+                    if len(self.reservoirs[key]) >= self.capacities[key]:
+                        break
+                urls = self.fetchers[key]()
+                with self.cond:
+                    added = self._add(key, urls)
+                    if added:
+                        self.cond.notify_all()
+                stale = 0 if added else stale + 1
+        except Exception as e:
+            print(f"Image pool refill failed for {key}: {e}")
+        finally:
+            with self.cond:
+                self.filling.discard(key)
+                self.cond.notify_all()
+
+    def prefetch(self, keys: Optional[Iterable[Hashable]] = None):
+        """Start filling the given reservoirs (all by default) in the background"""
+        with self.cond:
+            for key in (self.fetchers if keys is None else keys):
+                self._schedule(key)
+
+    def take(self, key: Hashable, count: int, timeout: float = 15.0) -> List[str]:
+        """
+        Up to count URLs for key. Waits (at most timeout seconds) only while
+        the reservoir is short and a refill is running.
+        """
+        with self.cond:
+            self._schedule(key)
+            reservoir = self.reservoirs[key]
+            self.cond.wait_for(lambda: len(reservoir) >= count or key not in self.filling, timeout)
+            urls = [reservoir.popleft() for _ in range(min(count, len(reservoir)))]
+            self._schedule(key)  # Top up for the next character
+        return urls
+
+    def size(self, key: Hashable) -> int:
+        with self.cond:
+            return len(self.reservoirs[key])
+
+    def close(self):
+        """Stop the background workers (running refills finish their current call)"""
+        with self.cond:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Image Header Probing
+Reads width, height and frame count from the first few KB of a PNG, JPEG,
+GIF or WebP file, so the collectors can enforce their minimum sizes and
+score images by real resolution without downloading them. The bytes come
+from an HTTP Range request; JPEGs whose size marker sits behind a large
+EXIF block get one retry with a bigger range.
+"""
+
+import struct
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+# fetch_range(url, length) -> response holding at least the first length bytes
+RangeFetch = Callable[[str, int], requests.Response]
+
+PROBE_SIZES = (16 * 1024, 128 * 1024)
+
+# JPEG start-of-frame markers (DHT, JPG and DAC share the range but carry no size)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _png(data: bytes) -> Optional[Dict]:
+    if len(data) < 24 or data[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', data[16:24])
+    frames = 1
+    # An acTL chunk before the first IDAT marks an animated PNG
+    pos = 8
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        if kind == b'IDAT':
+            break
+        if kind == b'acTL' and pos + 12 <= len(data):
+            frames = struct.unpack('>I', data[pos + 8:pos + 12])[0]
+            break
+        pos += length + 12
+    return {'format': 'png', 'width': width, 'height': height, 'frames': frames}
+
+
+def _skip_sub_blocks(data: bytes, pos: int) -> Optional[int]:
+    while pos < len(data):
+        size = data[pos]
+        pos += 1 + size
+        if size == 0:
+            return pos
+    return None
+
+
+def _gif(data: bytes) -> Optional[Dict]:
+    if len(data) < 13:
+        return None
+    width, height, flags = struct.unpack('<HHB', data[6:11])
+    frames = 0
+    pos = 13
+    if flags & 0x80:
+        pos += 3 * (2 << (flags & 0x07))
+    # Count image descriptors in the bytes we have (a lower bound if truncated)
+    while pos < len(data):
+        block = data[pos]
+        if block == 0x3B:  # Trailer
+            break
+        if block == 0x21:  # Extension: label, then sub-blocks
+            pos = _skip_sub_blocks(data, pos + 2)
+        elif block == 0x2C:  # Image descriptor
+            frames += 1
+            if pos + 10 > len(data):
+                break
+            local_flags = data[pos + 9]
+            pos += 10
+            if local_flags & 0x80:
+                pos += 3 * (2 << (local_flags & 0x07))
+            pos = _skip_sub_blocks(data, pos + 1)  # LZW minimum code size, then data
+        else:
+            break
+        if pos is None:
+            break
+    return {'format': 'gif', 'width': width, 'height': height, 'frames': max(frames, 1)}
+
+
+def _jpeg(data: bytes) -> Optional[Dict]:
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # No length field
+            pos += 2
+            continue
+        if marker == 0xD9:
+            return None
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker in _JPEG_SOF:
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            return {'format': 'jpeg', 'width': width, 'height': height, 'frames': 1}
+        pos += 2 + length
+    return None
+
+
+def _webp(data: bytes) -> Optional[Dict]:
+    if len(data) < 30:
+        return None
+    kind = data[12:16]
+    if kind == b'VP8 ':
+        if data[23:26] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack('<HH', data[26:30])
+        return {'format': 'webp', 'width': width & 0x3FFF, 'height': height & 0x3FFF, 'frames': 1}
+    if kind == b'VP8L':
+        if data[20] != 0x2F:
+            return None
+        bits = struct.unpack('<I', data[21:25])[0]
+        return {'format': 'webp', 'width': (bits & 0x3FFF) + 1,
+                'height': ((bits >> 14) & 0x3FFF) + 1, 'frames': 1}
+    if kind == b'VP8X':
+        flags = data[20]
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        frames = 1
+        if flags & 0x02:  # Animation flag: count ANMF chunks we can see
+            frames = 0
+            pos = 12
+            while pos + 8 <= len(data):
+                chunk, length = struct.unpack('<4sI', data[pos:pos + 8])
+                if chunk == b'ANMF':
+                    frames += 1
+                pos += 8 + length + (length & 1)
+            frames = max(frames, 2)
+        return {'format': 'webp', 'width': width, 'height': height, 'frames': frames}
+    return None
+
+
+def _supported(data: bytes) -> bool:
+    """Whether data starts with a signature parse_image_header understands"""
+    return (data.startswith(b'\x89PNG\r\n\x1a\n') or data[:6] in (b'GIF87a', b'GIF89a')
+            or data.startswith(b'\xff\xd8') or (data[:4] == b'RIFF' and data[8:12] == b'WEBP'))
+
+
+def parse_image_header(data: bytes) -> Optional[Dict]:
+    """
+    {'format', 'width', 'height', 'frames'} from the start of an image file,
+    or None if the format is unknown or the header is not in data.
+    GIF and WebP frame counts only cover the bytes given (a lower bound).
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _png(data)
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return _gif(data)
+    if data.startswith(b'\xff\xd8'):
+        return _jpeg(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _webp(data)
+    return None
+
+
+class ProbeError(requests.RequestException):
+    """The header could not be fetched (transient: the probe should be retried later)"""
+
+
+def probe_image(url: str, fetch_range: RangeFetch, sizes: Tuple[int, ...] = PROBE_SIZES) -> Optional[Dict]:
+    """
+    Header info for url using ranged downloads, or None if the format is
+    unsupported. Raises ProbeError if the bytes could not be fetched or a
+    supported format's header could not be found in them, so a failed probe
+    is never mistaken for an image that merely has an unknown format.
+    """
+    for length in sizes:
+        try:
+            response = fetch_range(url, length)
+        except requests.RequestException as e:
+            raise ProbeError(f"Range request failed: {e}") from e
+        if response.status_code not in (200, 206):
+            raise ProbeError(f"Range request returned HTTP {response.status_code}")
+        data = response.content
+        if not _supported(data):
+            return None
+        info = parse_image_header(data)
+        if info is not None:
+            return info
+        if len(data) < length or not data.startswith(b'\xff\xd8'):
+            break  # Whole file already read, or not a JPEG (only those headers sit deeper)
+    raise ProbeError("Image header not found in the probed bytes")
+
+
+def resolution_score(info: Dict) -> int:
+    """Quality score adjustment for a probed image's real resolution"""
+    shortest = min(info['width'], info['height'])
+    if shortest >= 1080:
+        return 3
+    if shortest >= 720:
+        return 2
+    if shortest >= 480:
+        return 1
+    if shortest < 300:
+        return -1
+    return 0
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Image Records
+One slotted record type for image candidates from every source, instead of
+a dict per image: a batch can hold hundreds of thousands of candidates and
+each dict costs several hundred bytes of hash table. Tier and source strings
+are interned, so every record of a source shares one string. Records keep
+the dict-style access the scoring, validation and dedup helpers use
+(img['url'], img.get('validation'), 'phash' in img), and to_dict() /
+from_dict() convert to and from the JSON shape stored in the character
+database and batch journals. Fields never set are absent, as with dict keys.
+"""
+
+import sys
+from typing import Dict, Iterator, List, Optional
+
+# Known fields, in the order they are written out
+FIELDS = (
+    'url', 'tier', 'source', 'quality_score',
+    'alt_text', 'page_url',  # Scraped pages (advanced scraper)
+    'validated', 'tags', 'title',  # API sources (collector)
+    'validation', 'phash',  # Filled in by validation / perceptual dedup
+    'local_path', 'sha256', 'size',  # Filled in by ImageStore downloads
+)
+
+FIELD_SET = frozenset(FIELDS)
+CONSTRUCTOR_FIELDS = frozenset(FIELDS[:4])
+INTERNED = frozenset({'tier', 'source'})
+
+
+class ImageRecord:
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, url: str, tier: str, source: str, quality_score: int, **fields):
+        self.url = url
+        self.tier = sys.intern(tier)
+        self.source = sys.intern(source)
+        self.quality_score = quality_score
+        self.extra = None  # Dict of fields outside FIELDS, created on first use
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ImageRecord':
+        """Record from the JSON shape (the dict is not kept)"""
+        record = cls(data['url'], data['tier'], data['source'], data.get('quality_score', 0))
+        for name, value in data.items():
+            if name not in CONSTRUCTOR_FIELDS:
+                record[name] = value
+        return record
+
+    def to_dict(self) -> Dict:
+        """JSON shape of the record (known fields first, then any extras)"""
+        data = {}
+        for name in FIELDS:
+            try:
+                data[name] = getattr(self, name)
+            except AttributeError:
+                continue
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # --- dict-style access -------------------------------------------------
+
+    def __getitem__(self, name: str):
+        if name in FIELD_SET:
+            try:
+                return getattr(self, name)
+            except AttributeError:
+                raise KeyError(name) from None
+        if self.extra is not None and name in self.extra:
+            return self.extra[name]
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value):
+        if name in FIELD_SET:
+            if name in INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, name, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def __contains__(self, name) -> bool:
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, name: str, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def update(self, fields: Optional[Dict] = None, **more):
+        for source in (fields or {}, more):
+            for name, value in source.items():
+                self[name] = value
+
+    def keys(self) -> List[str]:
+        return list(self.to_dict())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ImageRecord):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    __hash__ = None  # Mutable, like the dicts it replaces
+
+    def __repr__(self) -> str:
+        return f"ImageRecord({self.to_dict()!r})"
+
+
+def to_dicts(images) -> List[Dict]:
+    """JSON shape of a list of images (records or dicts already in that shape)"""
+    return [img.to_dict() if isinstance(img, ImageRecord) else img for img in images]
+
+
+def from_dicts(images) -> List[ImageRecord]:
+    """Records for a list of images in the JSON shape (records are passed through)"""
+    return [img if isinstance(img, ImageRecord) else ImageRecord.from_dict(img) for img in images]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Image Store
+Downloads validated images into the tier directories so cards can be
+rendered from local disk. Bodies are streamed in chunks into a partial file
+(resumed with a Range request after an interruption, deleted if not resumed
+within partial_max_age); once complete it is hashed and moved to <tier>/<sha256[:2]>/<sha256[2:4]>/<sha256><ext>,
+so the same image found under several URLs is stored once.
+"""
+
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+# fetch(url, headers) -> response opened with stream=True
+StreamFetch = Callable[[str, Dict], requests.Response]
+
+TIERS = ('static', 'animated', '3d')
+LOCK_STRIPES = 64
+
+
+class ImageStore:
+    def __init__(self, root: Path, chunk_size: int = 64 * 1024,
+                 max_file_size: Optional[int] = None, partial_max_age: float = 24 * 3600):
+        self.root = Path(root)
+        self.partial_dir = self.root / ".partial"
+        self.chunk_size = chunk_size
+        self.max_file_size = max_file_size
+        self.partial_max_age = partial_max_age
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]  # One writer per partial file
+        for tier in TIERS:
+            (self.root / tier).mkdir(parents=True, exist_ok=True)
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.prune_partials()
+
+    def blob_path(self, tier: str, digest: str, ext: str = '') -> Path:
+        """Sharded location of a blob"""
+        return self.root / tier / digest[:2] / digest[2:4] / f"{digest}{ext}"
+
+    def prune_partials(self) -> int:
+        """Delete partial files not written to for partial_max_age seconds"""
+        cutoff = time.time() - self.partial_max_age
+        removed = 0
+        for part in self.partial_dir.glob('*.part'):
+            try:
+                if part.stat().st_mtime < cutoff:
+                    part.unlink()
+                    removed += 1
+            except OSError:
+                continue  # Taken by a concurrent download or already gone
+        if removed:
+            print(f"Removed {removed} stale partial downloads")
+        return removed
+
+    def partial_path(self, url: str) -> Path:
+        return self.partial_dir / f"{hashlib.md5(url.encode()).hexdigest()}.part"
+
+    def relative(self, path: Path) -> str:
+        """Path stored in character records (relative to the store root's parent)"""
+        return Path(path).relative_to(self.root.parent).as_posix()
+
+    def has(self, local_path: Optional[str]) -> bool:
+        return bool(local_path) and (self.root.parent / local_path).is_file()
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        return self.locks[int(hashlib.md5(url.encode()).hexdigest(), 16) % LOCK_STRIPES]
+
+    @staticmethod
+    def _extension(url: str, content_type: str) -> str:
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if ext in ('.jpg', '.jpeg', '.png', '.gif', '.webp'):
+            return ext
+        guessed = mimetypes.guess_extension(content_type.split(';')[0].strip()) if content_type else None
+        return guessed or ''
+
+    def download(self, url: str, tier: str, fetch: StreamFetch) -> Optional[Dict]:
+        """
+        Stream url into the store.
+        Returns {'local_path', 'sha256', 'size'} or None if the download failed
+        (the partial file is kept so the next attempt resumes, unless the
+        server answered with a client error).
+        """
+        with self._url_lock(url):
+            part = self.partial_path(url)
+            offset = part.stat().st_size if part.exists() else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+            try:
+                response = fetch(url, headers)
+            except Exception as e:
+                print(f"Download failed for {url}: {e}")
+                return None
+
+            try:
+                if response.status_code == 416 and offset:
+                    pass  # Partial file already holds the whole body
+                elif response.status_code == 206 and offset and \
+                        response.headers.get('Content-Range', '').startswith(f'bytes {offset}-'):
+                    if not self._write(response, part, 'ab', offset):
+                        return None
+                elif response.status_code == 200:
+                    offset = 0  # Server ignored the Range; start over
+                    if not self._write(response, part, 'wb', offset):
+                        return None
+                else:
+                    print(f"Download failed for {url}: HTTP {response.status_code}")
+                    if 400 <= response.status_code < 500 and response.status_code != 429:
+                        part.unlink(missing_ok=True)  # Gone or forbidden: nothing left to resume
+                    return None
+                content_type = response.headers.get('Content-Type', '')
+            finally:
+                response.close()
+
+            return self._commit(part, url, tier, content_type)
+
+    def _write(self, response: requests.Response, part: Path, mode: str, offset: int) -> bool:
+        written = offset
+        try:
+            with open(part, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if not chunk:
+                        continue
+                    written += len(chunk)
+                    if self.max_file_size is not None and written > self.max_file_size:
+                        f.close()
+                        part.unlink()
+                        print(f"Download aborted: {response.url} exceeds {self.max_file_size} bytes")
+                        return False
+                    f.write(chunk)
+        except (requests.RequestException, OSError) as e:
+            print(f"Download interrupted at {written} bytes: {e}")
+            return False
+        return True
+
+    def _commit(self, part: Path, url: str, tier: str, content_type: str) -> Optional[Dict]:
+        """Hash the finished partial file and move it to its content address"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(part, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        if size == 0:
+            part.unlink()
+            return None
+
+        sha256 = digest.hexdigest()
+        path = self.blob_path(tier, sha256, self._extension(url, content_type))
+        if path.exists():
+            part.unlink()  # Same bytes already stored from another URL
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(part, path)
+        return {'local_path': self.relative(path), 'sha256': sha256, 'size': size}
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Batch Image Validation
+Runs a per-URL validator (HEAD request) over many candidates at once with
+a concurrency cap and an overall time budget, and remembers results on disk
+(SQLite) so fresh URLs are not re-checked
+"""
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from quality_scoring import TierBuckets
+
+Validator = Callable[[str], Tuple[bool, Dict]]
+
+
+class ValidationCache:
+    """
+    On-disk cache of HEAD validation results keyed by URL hash, in SQLite
+    (one row per URL, written as results arrive, safe to share between threads).
+    Entries younger than ttl are served without a request; older entries are
+    revalidated with If-None-Match / If-Modified-Since. Entries older than
+    max_age are dropped and at most max_entries are kept (least recently
+    checked go first). A legacy JSON cache file is imported on first run.
+    """
+
+    def __init__(self, path: Path, ttl: float = 24 * 3600, legacy_json: Optional[Path] = None,
+                 max_age: float = 7 * 24 * 3600, max_entries: int = 200_000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS validations ('
+            ' key TEXT PRIMARY KEY,'
+            ' entry TEXT NOT NULL,'
+            ' checked_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS validations_age ON validations (checked_at)')
+        self.conn.commit()
+        if legacy_json is not None:
+            self.import_json(legacy_json)
+
+    def import_json(self, json_path: Path) -> int:
+        """Load entries from the old single-file JSON cache once, then rename it"""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable validation cache {json_path}: {e}")
+            return 0
+        rows = [(key, json.dumps(entry, ensure_ascii=False), entry.get('checked_at', 0))
+                for key, entry in entries.items()]
+        with self.lock, self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO validations VALUES (?, ?, ?)', rows)
+        os.replace(json_path, json_path.with_suffix(json_path.suffix + '.imported'))
+        return len(rows)
+
+    def save(self):
+        """Drop expired entries and trim to max_entries (results are already on disk)"""
+        try:
+            with self.lock, self.conn:
+                self.conn.execute('DELETE FROM validations WHERE checked_at < ?',
+                                  (time.time() - self.max_age,))
+                self.conn.execute(
+                    'DELETE FROM validations WHERE key IN (SELECT key FROM validations'
+                    ' ORDER BY checked_at DESC LIMIT -1 OFFSET ?)', (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            print(f"Validation cache cleanup failed: {e}")  # Not worth failing a character over
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.md5(url.encode()).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute('SELECT entry FROM validations WHERE key = ?', (self.key(url),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry['checked_at'] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict:
+        """Headers that let the server answer 304 for an unchanged image"""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def result(entry: Dict) -> Tuple[bool, Dict]:
+        return entry['valid'], dict(entry['info'])
+
+    def _write(self, sql: str, params: Tuple):
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"Validation cache write failed: {e}")  # The result is still used, just not cached
+
+    def touch(self, url: str):
+        """Mark an entry as revalidated now"""
+        entry = self.get(url)
+        if entry:
+            entry['checked_at'] = time.time()
+            self._write('UPDATE validations SET entry = ?, checked_at = ? WHERE key = ?',
+                        (json.dumps(entry, ensure_ascii=False), entry['checked_at'], self.key(url)))
+
+    def store(self, url: str, is_valid: bool, info: Dict, response: requests.Response):
+        entry = {
+            'valid': is_valid,
+            'info': info,
+            'content_type': response.headers.get('content-type', '').lower(),
+            'size': response.headers.get('content-length'),
+            'status': response.status_code,
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'checked_at': time.time()
+        }
+        self._write('INSERT OR REPLACE INTO validations VALUES (?, ?, ?)',
+                    (self.key(url), json.dumps(entry, ensure_ascii=False), entry['checked_at']))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def validate_with_cache(cache: ValidationCache, url: str,
+                        head: Callable[..., requests.Response],
+                        check: Callable[[requests.Response], Tuple[bool, Dict]]) -> Tuple[bool, Dict]:
+    """
+    Validate url, consulting the cache first.
+    head(url, headers=...) performs the request; check(response) judges it.
+    Network errors (including a failed header probe inside check) propagate
+    to the caller and are never cached, nor are rate-limit and server-error
+    responses (429 / 5xx).
+    """
+    entry = cache.get(url)
+    if entry and cache.is_fresh(entry):
+        return cache.result(entry)
+
+    response = head(url, headers=cache.conditional_headers(entry))
+    if response.status_code == 304 and entry:
+        cache.touch(url)
+        return cache.result(entry)
+
+    is_valid, info = check(response)
+    if response.status_code != 429 and response.status_code < 500:
+        cache.store(url, is_valid, info, response)  # Throttling / server errors say nothing about the image
+    return is_valid, info
+
+
+def validate_batch(images: Dict[str, Dict], validator: Validator,
+                   max_workers: int = 8,
+                   time_budget: Optional[float] = None) -> List[Tuple[Dict, bool, Dict]]:
+    """
+    Validate a deduplicated {url_hash: img_data} dict concurrently.
+    Returns (img_data, is_valid, validation_info) for every image, ordered by
+    quality_score (highest first, ties keep insertion order). Images still
+    pending when time_budget seconds have elapsed are reported as invalid.
+    """
+    ordered = sorted(images.values(), key=lambda x: x['quality_score'], reverse=True)
+    results = [None] * len(ordered)
+    if not ordered:
+        return []
+
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        pending = {
+            executor.submit(validator, img['url']): i
+            for i, img in enumerate(ordered)
+        }
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    is_valid, info = future.result()
+                except Exception as e:
+                    is_valid, info = False, {'error': str(e)}
+                results[i] = (ordered[i], is_valid, info)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for i, result in enumerate(results):
+        if result is None:
+            results[i] = (ordered[i], False, {'error': 'Validation time budget exceeded'})
+
+    return results
+
+
+def validate_top_k(images: Dict[str, Dict], validator: Validator, buckets: TierBuckets,
+                   accept: Optional[Callable[[Dict, Dict], None]] = None, max_workers: int = 8,
+                   time_budget: Optional[float] = None) -> List[Tuple[Dict, bool, Dict]]:
+    """
+    Validate a {url_hash: img_data} dict best-first into buckets.
+    Candidates are submitted in quality_score order through a small window, and
+    one that can no longer enter its tier (buckets.could_accept) is never requested.
+    accept(img_data, validation_info) runs on each valid image before it is offered.
+    Returns (img_data, is_valid, validation_info) for every candidate checked;
+    ones still unchecked when time_budget runs out are reported as invalid.
+    """
+    ordered = sorted(images.values(), key=lambda x: x['quality_score'], reverse=True)
+    queued = iter(enumerate(ordered))
+    results = []
+    skipped = 0
+
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    pending = {}
+    try:
+        def fill():
+            nonlocal skipped
+            while len(pending) < max(1, max_workers) * 2:
+                item = next(queued, None)
+                if item is None:
+                    return
+                if not buckets.could_accept(item[1]):
+                    skipped += 1
+                    continue
+                pending[executor.submit(validator, item[1]['url'])] = item
+
+        fill()
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                order, img = pending.pop(future)
+                try:
+                    is_valid, info = future.result()
+                except Exception as e:
+                    is_valid, info = False, {'error': str(e)}
+                if is_valid:
+                    if accept is not None:
+                        accept(img, info)
+                    buckets.offer(img, order)
+                results.append((img, is_valid, info))
+            fill()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    expired = [img for _, img in pending.values()] + [img for _, img in queued]
+    results.extend((img, False, {'error': 'Validation time budget exceeded'}) for img in expired)
+    if skipped:
+        print(f"  Skipped {skipped} candidates that could not make the top {buckets.k}")
+    return results
+
+
+def iter_validate(images: Iterable[Dict], validator: Validator, max_workers: int = 8,
+                  time_budget: Optional[float] = None,
+                  should_validate: Optional[Callable[[Dict], bool]] = None) -> Iterator[Tuple[Dict, bool, Dict]]:
+    """
+    Streaming counterpart of validate_batch.
+    Consumes images lazily (e.g. from a generator still waiting on slow sources),
+    starts validating each one immediately and yields (img_data, is_valid,
+    validation_info) in completion order. Stops yielding once time_budget
+    seconds have elapsed. Images rejected by should_validate are dropped unchecked.
+    """
+    finished = queue.Queue()
+    end_of_input = object()
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    stopped = threading.Event()
+
+    def check(img: Dict):
+        try:
+            is_valid, info = validator(img['url'])
+        except Exception as e:
+            is_valid, info = False, {'error': str(e)}
+        finished.put((img, is_valid, info))
+
+    def feed():
+        submitted = 0
+        try:
+            for img in images:
+                if stopped.is_set():
+                    break
+                if should_validate is not None and not should_validate(img):
+                    continue
+                executor.submit(check, img)
+                submitted += 1
+        except Exception as e:
+            print(f"Error reading images to validate: {e}")
+        finally:
+            finished.put((end_of_input, submitted))
+
+    threading.Thread(target=feed, name='validation-feed', daemon=True).start()
+
+    expected, received = None, 0
+    try:
+        while expected is None or received < expected:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+            try:
+                item = finished.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if item[0] is end_of_input:
+                expected = item[1]
+                continue
+            received += 1
+            yield item
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Scraper Instrumentation
+Thread-safe counters and latency histograms shared by the collectors:
+per-request timings, status codes, bytes and retries by host, per-source
+timings and per-phase timings. Exports Prometheus text exposition format
+or JSON so a batch's time can be broken down after the fact.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+# Latency histogram upper bounds in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    'http_requests_total': 'HTTP requests by method, host and status code',
+    'http_request_seconds': 'HTTP request latency by method and host',
+    'http_response_bytes_total': 'Response body bytes received by host',
+    'http_retries_total': 'Retries by host (transport level and resilience layer)',
+    'http_cache_total': 'HTTP cache lookups by host and result (hit, revalidated, miss)',
+    'source_seconds': 'Time spent in each image source',
+    'source_images_total': 'Images returned by each image source',
+    'source_errors_total': 'Image source calls that raised',
+    'phase_seconds': 'Time spent in each pipeline phase',
+    'circuit_opened_total': 'Circuit breakers opened, by kind (host or source) and target',
+    'circuit_rejected_total': 'Calls failed fast by an open circuit breaker',
+    'download_bytes_total': 'Image bytes stored by the download stage, by tier',
+    'dedup_unhashed_total': 'Candidates perceptual dedup could not hash (kept without dedup)',
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def response_retries(response) -> int:
+    """Retries a response needed (TransportResponse.retries or urllib3's retry history)"""
+    retries = getattr(response, 'retries', None)
+    if retries is not None:
+        return retries
+    raw_retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return len(getattr(raw_retries, 'history', ()) or ())
+
+
+class Metrics:
+    def __init__(self, prefix: str = 'scraper_', buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 keep_samples: bool = False):
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self.keep_samples = keep_samples  # Raw observations for exact quantiles (benchmarks)
+        self.counters = {}  # name -> {label key: value}
+        self.histograms = {}  # name -> {label key: [per-bucket counts..., sum, count]}
+        self.samples = {}  # name -> {label key: [values]} while keep_samples is set
+        self.lock = threading.Lock()
+
+    # --- recording -----------------------------------------------------
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+            if self.keep_samples:
+                self.samples.setdefault(name, {}).setdefault(key, []).append(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the duration of the with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def track_request(self, method: str, url: str, send: Callable, read_body: bool = True):
+        """
+        Run send() and record its latency, status, retries and body size.
+        read_body=False for streamed responses (reading would consume the stream).
+        """
+        host = urlparse(url).hostname or ''
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception:
+            self.inc('http_requests_total', method=method, host=host, status='error')
+            raise
+        finally:
+            self.observe('http_request_seconds', time.perf_counter() - start, method=method, host=host)
+
+        self.inc('http_requests_total', method=method, host=host, status=response.status_code)
+        retries = response_retries(response)
+        if retries:
+            self.inc('http_retries_total', retries, host=host)
+        if read_body and method != 'HEAD':
+            self.inc('http_response_bytes_total', len(response.content), host=host)
+        return response
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.samples.clear()
+
+    # --- queries -------------------------------------------------------
+
+    def total(self, name: str) -> float:
+        """Sum of a counter over all label sets"""
+        with self.lock:
+            return sum(self.counters.get(name, {}).values())
+
+    def _bucket_quantile(self, state: List, q: float) -> float:
+        # Linear interpolation inside the bucket, like Prometheus histogram_quantile
+        rank = q * state[-1]
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, state):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]
+
+    def quantiles(self, name: str, qs: Sequence[float] = (0.5, 0.99)) -> List[Tuple[Dict, int, List[float]]]:
+        """
+        (labels, count, [quantile per q]) for every series of a histogram.
+        Exact when keep_samples was on, otherwise estimated from the buckets.
+        """
+        rows = []
+        with self.lock:
+            for key, state in sorted(self.histograms.get(name, {}).items()):
+                values = sorted(self.samples.get(name, {}).get(key, ()))
+                if len(values) == state[-1] and values:
+                    estimates = [values[max(0, math.ceil(q * len(values)) - 1)] for q in qs]  # Nearest rank
+                else:
+                    estimates = [self._bucket_quantile(state, q) for q in qs]
+                rows.append((dict(key), state[-1], estimates))
+        return rows
+
+    # --- export --------------------------------------------------------
+
+    def snapshot(self) -> Dict:
+        """JSON-friendly copy of every series"""
+        with self.lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                for name, series in self.counters.items()
+            }
+            histograms = {}
+            for name, series in self.histograms.items():
+                histograms[name] = []
+                for key, state in series.items():
+                    cumulative, buckets = 0, {}
+                    for bound, count in zip(self.buckets, state):
+                        cumulative += count
+                        buckets[str(bound)] = cumulative
+                    histograms[name].append({'labels': dict(key), 'count': state[-1],
+                                             'sum': state[-2], 'buckets': buckets})
+        return {'timestamp': time.time(), 'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                metric = self.prefix + name
+                lines.append(f'# HELP {metric} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {metric} counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f'{metric}{_format_labels(key)} {_format_value(value)}')
+            for name, series in sorted(self.histograms.items()):
+                metric = self.prefix + name
+                lines.append(f'# HELP {metric} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {metric} histogram')
+                for key, state in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, state):
+                        cumulative += count
+                        le = (('le', _format_value(bound)),)
+                        lines.append(f'{metric}_bucket{_format_labels(key, le)} {cumulative}')
+                    lines.append(f'{metric}_bucket{_format_labels(key, (("le", "+Inf"),))} {state[-1]}')
+                    lines.append(f'{metric}_sum{_format_labels(key)} {_format_value(state[-2])}')
+                    lines.append(f'{metric}_count{_format_labels(key)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Path):
+        """Write a snapshot atomically: JSON for *.json paths, Prometheus text otherwise"""
+        path = Path(path)
+        if path.suffix == '.json':
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.to_prometheus()
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def summary(self) -> str:
+        """Short human-readable breakdown of source and phase time"""
+        lines = []
+        with self.lock:
+            for name in ('phase_seconds', 'source_seconds'):
+                for key, state in sorted(self.histograms.get(name, {}).items(),
+                                         key=lambda item: -item[1][-2]):
+                    label = ', '.join(value for _, value in key)
+                    lines.append(f"  {label}: {state[-2]:.2f}s over {state[-1]} calls")
+        return '\n'.join(lines)
+
+
+# Process-wide registry shared by every collector
+metrics = Metrics()
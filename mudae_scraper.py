@@ -2,73 +2,162 @@ import requests
 import json
 import time
 import random
-from bs4 import BeautifulSoup
 import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Optional
+from http_transport import AsyncTransport
+from http_cache import HttpCache
+from rate_limiter import HostRateLimiter, shared_limiter
+from resilience import Resilience, shared_resilience
+from html_extraction import Rule, extract
+from metrics import metrics
 
 class MudaeCharacterScraper:
-    def __init__(self):
+    # First image, character link and series link of every table row
+    SEARCH_ROW_RULES = [
+        Rule('images', 'img', container=('tr', None), first=True),
+        Rule('names', 'a', {'href': lambda x: x and '/character/' in x},
+             container=('tr', None), first=True, text=True),
+        Rule('series', 'a', {'href': lambda x: x and '/series/' in x},
+             container=('tr', None), first=True, text=True),
+    ]
+    
+    def __init__(self, transport: Optional[AsyncTransport] = None,
+                 rate_limiter: Optional[HostRateLimiter] = None,
+                 http_cache: Optional[HttpCache] = None,
+                 resilience: Optional[Resilience] = None):
         self.base_url = "https://mudae.net"
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.http = transport or self.session
+        self.rate_limiter = rate_limiter or shared_limiter
+        self.resilience = resilience or shared_resilience
         self.characters_cache = []
+        # Search pages are re-used across runs for http_cache.min_ttl
+        self.http_cache = http_cache or HttpCache(Path("mudae_data") / "http_cache.db")
     
-    def scrape_mudae_search(self, limit=10000):
-        """Scrape characters from Mudae's official search page"""
+    def _get(self, url, **kwargs):
+        """GET through the configured transport, rate limited per host, retried and circuit broken"""
+        def attempt():
+            self.rate_limiter.acquire(url)
+            return metrics.track_request('GET', url, lambda: self.http.get(url, **kwargs))
+        return self.resilience.request(url, attempt)
+    
+    def parse_search_rows(self, content, category='all'):
+        """Extract character rows from a search results page"""
         characters = []
         
-        # Categories to scrape from
-        categories = ['anime', 'manga', 'games', 'all']
+        # Extract character table rows in one streaming pass
+        found = extract(content, self.SEARCH_ROW_RULES)
+        images = {img['_container']: img for img in found['images']}
+        series_links = {link['_container']: link for link in found['series']}
         
-        for category in categories:
-            print(f"Scraping {category} characters...")
+        for name_link in found['names']:
             try:
-                # Get the search page for this category
-                url = f"{self.base_url}/search?type=character&lastUpdate=true#{category}"
-                response = self.session.get(url)
+                row = name_link['_container']
+                img_element = images.get(row)
+                series_link = series_links.get(row)
                 
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    # Find character table rows
-                    rows = soup.find_all('tr')
+                if img_element and series_link:
+                    character_data = {
+                        'name': name_link['text'].strip().replace(' 🆕', ''),
+                        'series': series_link['text'].strip(),
+                        'imageUrl': img_element.get('src'),
+                        'type': category,
+                        'character_id': name_link['href'].split('/')[-2] if name_link.get('href') else None
+                    }
                     
-                    for row in rows:
-                        try:
-                            # Extract character data from table row
-                            img_element = row.find('img')
-                            name_link = row.find('a', href=lambda x: x and '/character/' in x)
-                            series_link = row.find('a', href=lambda x: x and '/series/' in x)
-                            
-                            if img_element and name_link and series_link:
-                                character_data = {
-                                    'name': name_link.get_text().strip().replace(' 🆕', ''),
-                                    'series': series_link.get_text().strip(),
-                                    'imageUrl': img_element.get('src'),
-                                    'type': category,
-                                    'character_id': name_link.get('href').split('/')[-2] if name_link.get('href') else None
-                                }
-                                
-                                # Clean up the image URL
-                                if character_data['imageUrl'] and not character_data['imageUrl'].startswith('http'):
-                                    character_data['imageUrl'] = f"{self.base_url}{character_data['imageUrl']}"
-                                
-                                characters.append(character_data)
-                                
-                                if len(characters) >= limit:
-                                    break
-                        except Exception as e:
-                            continue
+                    # Clean up the image URL
+                    if character_data['imageUrl'] and not character_data['imageUrl'].startswith('http'):
+                        character_data['imageUrl'] = f"{self.base_url}{character_data['imageUrl']}"
                     
-                    if len(characters) >= limit:
-                        break
-                        
+                    characters.append(character_data)
             except Exception as e:
-                print(f"Error scraping {category}: {e}")
                 continue
         
-        return characters[:limit]
+        return characters
+    
+    def fetch_search_page(self, page):
+        """Fetch and parse one page of the character search results"""
+        params = {'type': 'character', 'lastUpdate': 'true', 'page': page}
+        url = f"{self.base_url}/search"
+        response = self.http_cache.fetch(
+            url, lambda headers: self._get(url, params=params, headers=headers or None, timeout=10), params
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code} for search page {page}")
+        return self.parse_search_rows(response.content)
+    
+    def crawl_mudae_search(self, limit=10000, window=8, start_page=1, max_pages=1000, max_failures=3):
+        """
+        Crawl the paginated search results, fetching up to `window` pages at once.
+        Yields character rows as pages arrive, deduplicated by character_id.
+        Stops at the first empty page, the first page that adds no new
+        character (a server that ignores `page` or repeats its last page),
+        after `limit` characters, after max_pages pages (None for no cap),
+        or after max_failures consecutive page errors.
+        """
+        seen = set()
+        yielded = 0
+        failures = 0
+        next_page = start_page
+        last_page = start_page + max_pages - 1 if max_pages else None
+        end_page = None  # First page known to be past the end
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=window)
+        
+        def fill():
+            nonlocal next_page
+            while (len(pending) < window
+                   and (end_page is None or next_page < end_page)
+                   and (last_page is None or next_page <= last_page)):
+                pending[executor.submit(self.fetch_search_page, next_page)] = next_page
+                next_page += 1
+        
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = pending.pop(future)
+                    try:
+                        rows = future.result()
+                        failures = 0
+                    except Exception as e:
+                        print(f"Error crawling search page {page}: {e}")
+                        failures += 1
+                        if failures >= max_failures:
+                            end_page = min(end_page or page, page)
+                        continue
+                    
+                    if not rows:
+                        end_page = min(end_page or page, page)
+                        continue
+                    
+                    new_rows = 0
+                    for character in rows:
+                        key = character['character_id'] or (character['name'], character['series'])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        new_rows += 1
+                        yield character
+                        yielded += 1
+                        if yielded >= limit:
+                            return
+                    if not new_rows:
+                        end_page = min(end_page or page, page)
+                fill()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def scrape_mudae_search(self, limit=10000, window=8):
+        """Scrape characters from Mudae's official search page"""
+        print(f"Crawling Mudae search for up to {limit} characters...")
+        return list(self.crawl_mudae_search(limit=limit, window=window))
     
     def get_cached_characters(self):
         """Get pre-cached popular characters for instant loading"""
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Character Name Index
+Normalized name index over the character database, the AniList character
+cache (anilist_characters_cache.json) and the card version table
+(character_versions.json). Names are folded (accents, case, punctuation)
+so a requested character can be resolved to an existing key before any
+scraping starts ("Monkey D Luffy" / "One Piece" -> "monkey_d._luffy_one_piece")
+by exact folded name and series. Names are also indexed by character
+trigrams so the bot can suggest and autocomplete names ("Luffy"); fuzzy
+scores are only ever suggestions. Lookups touch only the posting lists of
+the query's trigrams.
+"""
+
+import json
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from character_store import character_key
+
+ANILIST_CACHE = Path("anilist_characters_cache.json")
+CHARACTER_VERSIONS = Path("character_versions.json")
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase ASCII words: 'Monkey D. Luffy' -> 'monkey d luffy', 'Rem (Re:Zero)' -> 'rem re zero'"""
+    folded = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return _NON_ALNUM.sub(' ', folded).strip()
+
+
+def trigrams(normalized: str) -> set:
+    """Distinct character trigrams of a normalized name ('luffy' -> ' lu', 'luf', 'uff', 'ffy', 'fy ')"""
+    grams = set()
+    for word in normalized.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query_size: int, entry_size: int, common: int) -> float:
+    """
+    Dice coefficient of two trigram sets, raised to 0.9 * containment
+    when the query is (nearly) all inside the entry ('luffy' in 'monkey d luffy').
+    """
+    if not query_size or not entry_size:
+        return 0.0
+    dice = 2 * common / (query_size + entry_size)
+    return max(dice, 0.9 * common / query_size)
+
+
+class NameIndex:
+    def __init__(self):
+        self.keys = []  # entry id -> existing key
+        self.names = []  # entry id -> display name
+        self.series = []  # entry id -> display series ('' if unknown)
+        self.folded_series = []  # entry id -> normalized series (or the normalized key if unknown)
+        self.sources = []  # entry id -> set of source names
+        self.sizes = []  # entry id -> trigram count of the normalized name
+        self.by_key = {}  # key -> entry id
+        self.by_name = {}  # normalized name or alias -> [entry ids]
+        self.postings = {}  # trigram -> [entry ids]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, name: str, series: str = '', source: str = ''):
+        """Index one character; the same key from several sources is one entry (other names become aliases)"""
+        entry = self.by_key.get(key)
+        if entry is not None:
+            self.sources[entry].add(source)
+            aliases = self.by_name.setdefault(normalize_name(name), [])
+            if entry not in aliases:
+                aliases.append(entry)
+            if series and not self.series[entry]:
+                self.series[entry] = series
+                self.folded_series[entry] = normalize_name(series)
+            return
+
+        folded = normalize_name(name)
+        grams = trigrams(folded)
+        entry = len(self.keys)
+        self.keys.append(key)
+        self.names.append(name)
+        self.series.append(series or '')
+        self.folded_series.append(normalize_name(series) if series else normalize_name(key))
+        self.sources.append({source})
+        self.sizes.append(len(grams))
+        self.by_key[key] = entry
+        self.by_name.setdefault(folded, []).append(entry)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(entry)
+
+    # --- loaders -------------------------------------------------------
+
+    def add_character_database(self, store) -> int:
+        """Index a CharacterStore (or any mapping of key -> record with name/series)"""
+        if hasattr(store, 'names'):
+            rows = store.names()
+        else:
+            rows = [(key, record.get('name'), record.get('series')) for key, record in store.items()]
+        for key, name, series in rows:
+            self.add(key, name or key.replace('_', ' '), series or '', 'database')
+        return len(rows)
+
+    def add_anilist_cache(self, path: Path = ANILIST_CACHE) -> int:
+        """Index anilist_characters_cache.json ({'characters': [{'name', 'anime'}, ...]})"""
+        data = _load_json(path)
+        characters = data.get('characters', []) if isinstance(data, dict) else []
+        for character in characters:
+            name, series = character.get('name'), character.get('anime') or ''
+            if name:
+                self.add(character_key(name, series), name, series, 'anilist')
+        return len(characters)
+
+    def add_versions(self, path: Path = CHARACTER_VERSIONS) -> int:
+        """Index character_versions.json (keys only: name and series are not separable)"""
+        data = _load_json(path)
+        keys = list(data) if isinstance(data, dict) else []
+        for key in keys:
+            self.add(key, key.replace('_', ' '), '', 'versions')
+        return len(keys)
+
+    @classmethod
+    def build(cls, character_db=None, anilist_cache: Optional[Path] = ANILIST_CACHE,
+              versions: Optional[Path] = CHARACTER_VERSIONS) -> 'NameIndex':
+        """Index every available source (missing or unreadable files are skipped)"""
+        index = cls()
+        if character_db is not None:
+            index.add_character_database(character_db)
+        if anilist_cache is not None:
+            index.add_anilist_cache(anilist_cache)
+        if versions is not None:
+            index.add_versions(versions)
+        return index
+
+    # --- queries -------------------------------------------------------
+
+    def _series_matches(self, entry: int, folded_series: str) -> bool:
+        known = self.folded_series[entry]
+        if known == folded_series or f" {folded_series} " in f" {known} ":
+            return True
+        return similarity(*_sizes_and_common(folded_series, known)) >= 0.8
+
+    def search(self, query: str, limit: int = 10, series: Optional[str] = None,
+               source: Optional[str] = None, min_score: float = 0.3) -> List[Tuple[float, str, str, str]]:
+        """
+        Best matches for a (partial) name as (score, key, name, series), best first.
+        series / source restrict the candidates; scores are in [0, 1].
+        """
+        grams = trigrams(normalize_name(query))
+        query_size = len(grams)
+        if not query_size:
+            return []
+
+        common = Counter()
+        for gram in grams:
+            common.update(self.postings.get(gram, ()))  # Counting runs in C
+
+        # Fewest shared trigrams that can still reach min_score (entries have at least one)
+        needed = min(min_score * query_size / 0.9, min_score * (query_size + 1) / 2)
+        folded_series = normalize_name(series) if series else None
+        sizes = self.sizes
+        scored = []
+        for entry, shared in common.items():
+            if shared < needed:
+                continue
+            score = similarity(query_size, sizes[entry], shared)
+            if score < min_score:
+                continue
+            if source is not None and source not in self.sources[entry]:
+                continue
+            if folded_series and not self._series_matches(entry, folded_series):
+                continue
+            scored.append((score, entry))
+        scored.sort(key=lambda item: (-item[0], self.sizes[item[1]], item[1]))
+        return [(round(score, 4), self.keys[entry], self.names[entry], self.series[entry])
+                for score, entry in scored[:limit]]
+
+    def resolve(self, name: str, series: Optional[str] = None,
+                 source: Optional[str] = None) -> Optional[str]:
+        """
+        Existing key for a character, or None. Used for skip decisions, so it
+        never guesses: the key itself, or a unique entry whose folded name (or
+        alias) and folded series both match exactly. Use search() for fuzzy
+        suggestions.
+        """
+        if series is not None:
+            entry = self.by_key.get(character_key(name, series))
+            if entry is not None and (source is None or source in self.sources[entry]):
+                return self.keys[entry]
+
+        folded_series = normalize_name(series) if series else None
+        exact = [entry for entry in self.by_name.get(normalize_name(name), ())
+                 if (source is None or source in self.sources[entry])
+                 and (folded_series is None or self.folded_series[entry] == folded_series)]
+        if len(exact) == 1:
+            return self.keys[exact[0]]
+        return None  # Unknown, or ambiguous (same name in several series)
+
+
+def _sizes_and_common(a: str, b: str) -> Tuple[int, int, int]:
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return len(grams_a), len(grams_b), len(grams_a & grams_b)
+
+
+def _load_json(path: Path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Skipping unreadable name source {path}: {e}")
+        return None
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Perceptual Image Deduplication
+Drops the same artwork served from different CDNs or at different sizes.
+Each candidate gets a 64-bit difference hash (dHash) computed from a small
+ranged download; a persistent index keeps the hashes of images already
+accepted so near-duplicates are caught across characters and runs.
+Requires Pillow; without it the stage is unavailable.
+"""
+
+import io
+import json
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    from PIL import Image, ImageFile
+except ImportError:  # Optional dependency
+    Image = ImageFile = None
+
+from metrics import metrics
+
+HASH_BANDS = 8  # 8-bit bands; exact match in one band is guaranteed for distance < 8
+
+
+def dhash(image, size: int = 8) -> int:
+    """Difference hash: compares horizontally adjacent pixels of a tiny grayscale copy"""
+    pixels = list(image.convert('L').resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+_truncated_lock = threading.Lock()
+_truncated_users = 0
+
+
+@contextmanager
+def truncated_loading():
+    """
+    Let Pillow decode truncated files (the missing part is left blank) while
+    any caller is inside; Pillow only has a process-wide switch for this.
+    """
+    global _truncated_users
+    with _truncated_lock:
+        _truncated_users += 1
+        ImageFile.LOAD_TRUNCATED_IMAGES = True
+    try:
+        yield
+    finally:
+        with _truncated_lock:
+            _truncated_users -= 1
+            if not _truncated_users:
+                ImageFile.LOAD_TRUNCATED_IMAGES = False
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class PerceptualHashIndex:
+    """Append-only JSONL index of accepted image hashes with banded lookup"""
+
+    def __init__(self, path: Path, threshold: int = 6):
+        if threshold >= HASH_BANDS:
+            raise ValueError(f"threshold must be below {HASH_BANDS}")
+        self.path = Path(path)
+        self.threshold = threshold
+        self.entries = []
+        self.urls = set()
+        self.bands = [{} for _ in range(HASH_BANDS)]
+        self.lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._insert(json.loads(line))
+                    except ValueError:
+                        continue
+
+    @staticmethod
+    def _band_values(value: int) -> List[int]:
+        return [(value >> (8 * i)) & 0xFF for i in range(HASH_BANDS)]
+
+    def _insert(self, entry: Dict):
+        position = len(self.entries)
+        self.entries.append(entry)
+        self.urls.add(entry['url'])
+        for band, band_value in zip(self.bands, self._band_values(int(entry['hash'], 16))):
+            band.setdefault(band_value, []).append(position)
+
+    def find(self, value: int, exclude_key: Optional[str] = None) -> Optional[Dict]:
+        """Closest stored entry within threshold (ignoring exclude_key's own images)"""
+        with self.lock:
+            seen = set()
+            best, best_distance = None, self.threshold + 1
+            for band, band_value in zip(self.bands, self._band_values(value)):
+                for position in band.get(band_value, ()):
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    entry = self.entries[position]
+                    if entry['char_key'] == exclude_key:
+                        continue
+                    distance = hamming(value, int(entry['hash'], 16))
+                    if distance < best_distance:
+                        best, best_distance = entry, distance
+            return best
+
+    def add(self, value: int, url: str, char_key: str):
+        entry = {'hash': f'{value:016x}', 'url': url, 'char_key': char_key}
+        with self.lock:
+            if url in self.urls:
+                return
+            self._insert(entry)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+class PerceptualDeduplicator:
+    """
+    fetch(url, length, start=0) must return a response whose content holds
+    the length bytes of the image from offset start (206), or the file from
+    its first byte if the server ignores the Range (200). Images that do not
+    decode from partial_bytes (most files above it) are continued from there
+    up to max_bytes; pass the caller's file size limit as max_bytes.
+    """
+
+    def __init__(self, index: PerceptualHashIndex, fetch: Callable,
+                 partial_bytes: int = 512 * 1024, max_workers: int = 8,
+                 max_bytes: int = 16 * 1024 * 1024):
+        if Image is None:
+            raise ImportError("Perceptual deduplication requires Pillow (pip install Pillow)")
+        self.index = index
+        self.fetch = fetch
+        self.partial_bytes = partial_bytes
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _decode_hash(content: bytes) -> int:
+        with Image.open(io.BytesIO(content)) as image:
+            image.draft('L', (64, 64))  # JPEG: decode at reduced scale
+            return dhash(image)
+
+    def hash_url(self, url: str) -> Optional[int]:
+        """dHash of the image at url, or None if it cannot be downloaded or decoded"""
+        try:
+            response = self.fetch(url, self.partial_bytes)
+            if response.status_code not in (200, 206):
+                return None
+            content = response.content
+            try:
+                return self._decode_hash(content)
+            except OSError:
+                if len(content) < self.partial_bytes:
+                    raise  # The whole file was there: it is broken, not truncated
+            # Larger than the partial download: fetch the rest (a file cut at
+            # max_bytes still hashes, with its missing rows left blank)
+            if self.max_bytes > len(content):
+                response = self.fetch(url, self.max_bytes - len(content), start=len(content))
+                if response.status_code == 206:
+                    content += response.content
+                elif response.status_code == 200:
+                    content = response.content  # Range ignored: the body starts at byte 0
+                else:
+                    return None
+            with truncated_loading():
+                return self._decode_hash(content)
+        except Exception:
+            return None  # Unsupported or broken: keep the image, skip dedup
+
+    def filter(self, unique_images: Dict[str, Dict], char_key: str) -> Dict[str, Dict]:
+        """
+        Drop near-duplicates from {url_hash: img_data}, keeping the best scored copy.
+        Kept images get a 'phash' field; call remember() for the ones finally accepted.
+        """
+        ordered = sorted(unique_images.items(), key=lambda item: item[1]['quality_score'], reverse=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            hashes = list(executor.map(lambda item: self.hash_url(item[1]['url']), ordered))
+
+        kept = {}
+        kept_hashes = []
+        dropped = unhashed = 0
+        for (url_hash, img), value in zip(ordered, hashes):
+            if value is None:
+                unhashed += 1
+            else:
+                if any(hamming(value, other) <= self.index.threshold for other in kept_hashes):
+                    dropped += 1
+                    continue
+                if self.index.find(value, exclude_key=char_key):
+                    dropped += 1
+                    continue
+                kept_hashes.append(value)
+                img['phash'] = f'{value:016x}'
+            kept[url_hash] = img
+
+        if dropped:
+            print(f"  Dropped {dropped} near-duplicate images")
+        if unhashed:
+            metrics.inc('dedup_unhashed_total', unhashed)
+            print(f"  Could not hash {unhashed} images (kept without dedup)")
+        return kept
+
+    def remember(self, images: List[Dict], char_key: str):
+        """Add accepted images to the persistent index"""
+        for img in images:
+            if 'phash' in img:
+                self.index.add(int(img['phash'], 16), img['url'], char_key)
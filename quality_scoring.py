@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Batch Quality Scoring
+Scores candidates from their URL markers (fixed substring tests on the
+lowercased URL, which beat both any() scans and regex alternation in
+CPython), the probed resolution and a per-source bonus, and rank_by_tier()
+selects the top k per tier without sorting the full set.
+TierBuckets keeps the top k per tier in bounded heaps while results stream
+in, and tells the validator which candidates can no longer make the cut.
+top_k() uses NumPy when installed, plain Python otherwise; both give the
+same results.
+"""
+
+import heapq
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+from image_probe import resolution_score
+
+BASE_SCORE = 5
+
+TIERS = ('static', '3d', 'animated')
+
+# Extra points the advanced scraper gives some sources
+SOURCE_BONUS = {
+    'myanimelist': 2,
+    'zerochan': 1,
+}
+
+
+def _score(url_lower: str, info: Optional[Dict], bonus: int = 0) -> int:
+    """Score of one lowercased URL; a probed resolution in info replaces the URL guess"""
+    score = BASE_SCORE
+    if info and 'width' in info:
+        score += resolution_score(info)
+    elif '1080' in url_lower or '720' in url_lower or '4k' in url_lower or 'uhd' in url_lower:
+        score += 3
+    elif '480' in url_lower or '360' in url_lower:
+        score -= 1
+    if 'thumb' in url_lower:  # Also covers 'thumbnail'
+        score -= 2
+    elif 'original' in url_lower or 'full' in url_lower:
+        score += 2
+    if url_lower.endswith(('.png', '.gif')):
+        score += 1
+    return max(1, score) + bonus
+
+
+def score_url(url: str) -> int:
+    """Quality score of a single URL (same rules as score_images, without probe data)"""
+    return _score(url.lower(), None)
+
+
+def score_image(img: Dict, source_bonus: Optional[Dict[str, int]] = None) -> int:
+    """Quality score of one candidate (same rules as score_images)"""
+    bonuses = SOURCE_BONUS if source_bonus is None else source_bonus
+    return _score(img['url'].lower(), img.get('validation'), bonuses.get(img.get('source'), 0))
+
+
+def score_images(images: Sequence[Dict], source_bonus: Optional[Dict[str, int]] = None) -> List[int]:
+    """
+    Score a candidate set in one call (one list per source or character).
+    URL markers give the base score; a probed resolution (from validation info)
+    replaces the URL-based resolution guess; source bonuses are added last.
+    """
+    bonuses = SOURCE_BONUS if source_bonus is None else source_bonus
+    return [_score(img['url'].lower(), img.get('validation'), bonuses.get(img.get('source'), 0))
+            for img in images]
+
+
+def top_k(scores, k: Optional[int] = None) -> List[int]:
+    """
+    Indices of the k highest scores, best first (ties keep input order).
+    Only the selected k are sorted.
+    """
+    n = len(scores)
+    if k is None or k >= n:
+        k = n
+    if k <= 0:
+        return []
+
+    if np is not None:
+        values = np.asarray(scores)
+        if k < n:
+            candidates = np.argpartition(-values, k - 1)[:k]
+            # argpartition splits ties at the boundary arbitrarily; take all ties, then trim
+            threshold = values[candidates].min()
+            candidates = np.flatnonzero(values >= threshold)
+        else:
+            candidates = np.arange(n)
+        order = np.lexsort((candidates, -values[candidates]))
+        return candidates[order][:k].tolist()
+
+    return heapq.nsmallest(k, range(n), key=lambda i: (-scores[i], i))
+
+
+def rank_by_tier(images: Sequence[Dict], scores=None, k: Optional[int] = None,
+                 tiers: Sequence[str] = TIERS) -> Dict[str, List[Dict]]:
+    """
+    Group images into tiers, each holding its top k by score (all if k is None).
+    scores defaults to each image's quality_score.
+    """
+    if scores is None:
+        scores = [img['quality_score'] for img in images]
+    ranked = {}
+    for tier in tiers:
+        members = [i for i, img in enumerate(images) if img['tier'] == tier]
+        tier_scores = [scores[i] for i in members]
+        ranked[tier] = [images[members[j]] for j in top_k(tier_scores, k)]
+    return ranked
+
+
+class TierBuckets:
+    """
+    Best k images per tier, kept in bounded min-heaps as results arrive.
+    Ties go to the image offered with the lower order (earlier by default),
+    matching a stable sort-then-slice. max_boost is the most a candidate's
+    score can still rise after validation (e.g. from the probed resolution).
+    """
+
+    def __init__(self, k: int = 250, tiers: Sequence[str] = TIERS, max_boost: int = 0):
+        self.k = k
+        self.max_boost = max_boost
+        self.heaps = {tier: [] for tier in tiers}
+        self.accepted = 0  # Valid images offered, kept or not
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def offer(self, img: Dict, order: Optional[int] = None) -> bool:
+        """Add a validated image; returns whether it is (for now) in its tier's top k"""
+        heap = self.heaps.get(img['tier'])
+        with self.lock:
+            self.accepted += 1
+            if heap is None:
+                return False
+            if order is None:
+                order = self.counter
+            self.counter += 1
+            entry = (img['quality_score'], -order, img)
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+                return True
+            if entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+                return True
+            return False
+
+    def could_accept(self, img: Dict) -> bool:
+        """False once img cannot enter its tier even with the largest possible boost"""
+        heap = self.heaps.get(img['tier'])
+        if heap is None:
+            return False
+        with self.lock:
+            return len(heap) < self.k or img['quality_score'] + self.max_boost > heap[0][0]
+
+    def ranked(self) -> Dict[str, List[Dict]]:
+        """Each tier's images, best first"""
+        with self.lock:
+            return {tier: [entry[2] for entry in sorted(heap, key=lambda e: e[:2], reverse=True)]
+                    for tier, heap in self.heaps.items()}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for tier_images in self.ranked().values():
+            yield from tier_images
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Per-Host Rate Limiter
+Token buckets keyed by host, shared by the image collectors so that a
+request only waits when its own host needs a pause, plus a global cap on
+requests in flight for batch runs
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# (requests per second, burst size) per domain; subdomains share their parent's bucket
+DEFAULT_HOST_LIMITS = {
+    'mudae.net': (2.0, 2),
+    'anime-planet.com': (2.0, 2),
+    'myanimelist.net': (2.0, 2),
+    'zerochan.net': (2.0, 2),
+    'tenor.googleapis.com': (2.0, 2),
+    'api.waifu.pics': (5.0, 5),
+    'nekos.life': (3.0, 3),
+    'api.waifu.im': (2.0, 2),
+    'api.pushshift.io': (2.0, 2),
+    'danbooru.donmai.us': (1.0, 1),
+    # Image CDNs: validation HEADs and header probes land here, not on the API / page hosts
+    'i.redd.it': (10.0, 10),
+    'cdn.donmai.us': (10.0, 10),
+    'i.waifu.pics': (10.0, 10),
+    'cdn.nekos.life': (10.0, 10),
+    'cdn.waifu.im': (10.0, 10),
+    'media.tenor.com': (10.0, 10),
+    'static.zerochan.net': (10.0, 10),
+    'cdn.myanimelist.net': (10.0, 10),
+    'cdn.anime-planet.com': (10.0, 10),
+}
+
+DEFAULT_LIMIT = (2.0, 2)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens now and return how many seconds the caller must wait"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block until tokens are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default: Tuple[float, float] = DEFAULT_LIMIT):
+        self.limits = dict(DEFAULT_HOST_LIMITS if limits is None else limits)
+        self.default = default
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def configure(self, domain: str, rate: float, burst: float = 1):
+        """Set the limit for a domain (replaces any existing bucket)"""
+        with self.lock:
+            self.limits[domain] = (rate, burst)
+            self.buckets.pop(domain, None)
+
+    def bucket_key(self, host: str) -> str:
+        """Map a host to its configured domain, or to itself if unconfigured"""
+        host = host.lower().split(':')[0]
+        parts = host.split('.')
+        for i in range(len(parts) - 1):
+            domain = '.'.join(parts[i:])
+            if domain in self.limits:
+                return domain
+        return host
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """Get (or create) the bucket responsible for a URL"""
+        key = self.bucket_key(urlparse(url).netloc)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                rate, burst = self.limits.get(key, self.default)
+                bucket = self.buckets[key] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, url: str, tokens: float = 1):
+        """Block until a request to url's host is allowed"""
+        self.bucket_for(url).acquire(tokens)
+
+
+class RequestBudget:
+    """
+    Caps the number of requests in flight across every collector that shares it.
+    Waiters are served first-come first-served so no character starves.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waiters = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.in_flight < self.max_in_flight and not self.waiters:
+                self.in_flight += 1
+                return
+            ready = threading.Event()
+            self.waiters.append(ready)
+        ready.wait()  # Slot is handed over by release()
+
+    def release(self):
+        with self.lock:
+            if self.waiters:
+                self.waiters.popleft().set()
+            else:
+                self.in_flight -= 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# Process-wide limiter so every collector respects the same per-host budgets
+shared_limiter = HostRateLimiter()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Retries and Circuit Breakers
+Transient request failures (connection errors, timeouts, 429/5xx) are
+retried with jittered exponential backoff. Each host and each image source
+has a circuit breaker: after failure_threshold consecutive failures it
+opens and calls fail fast with CircuitOpenError for a cooldown, then one
+trial call decides whether it closes again. A dead upstream then costs a
+few timeouts per cooldown instead of its full timeout on every character.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from metrics import metrics
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host or source whose breaker is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None  # Set while open
+        self.trial_running = False  # Half-open: one call is testing the upstream
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return 'open'
+            return 'half-open'
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (claims the trial slot when half-open)"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this opened the breaker"""
+        with self.lock:
+            self.failures += 1
+            reopened = self.trial_running
+            self.trial_running = False
+            if reopened or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class _SourceCall:
+    """Outcome of the requests one source call made on its own thread"""
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+
+    @property
+    def all_failed(self) -> bool:
+        return self.failed > 0 and self.succeeded == 0
+
+
+class Resilience:
+    """
+    Breakers keyed by host and by source name, plus the retry policy.
+    retries is the number of extra attempts; the delay before attempt n is
+    uniform in [0, min(max_delay, base_delay * 2**n)] ("full jitter"),
+    or the server's Retry-After if that is longer (both capped at max_delay).
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0, retries: int = 2,
+                 base_delay: float = 0.5, max_delay: float = 8.0, source_failure_threshold: int = 3):
+        self.failure_threshold = failure_threshold
+        self.source_failure_threshold = source_failure_threshold
+        self.cooldown = cooldown
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breakers = {}  # ('host' | 'source', name) -> CircuitBreaker
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def breaker(self, kind: str, name: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get((kind, name))
+            if breaker is None:
+                threshold = self.source_failure_threshold if kind == 'source' else self.failure_threshold
+                breaker = self.breakers[(kind, name)] = CircuitBreaker(threshold, self.cooldown)
+            return breaker
+
+    def open_circuits(self) -> Dict[str, str]:
+        """'kind:name' -> state for every breaker that is not closed"""
+        with self.lock:
+            breakers = list(self.breakers.items())
+        states = {f"{kind}:{name}": breaker.state for (kind, name), breaker in breakers}
+        return {key: state for key, state in states.items() if state != 'closed'}
+
+    def backoff(self, attempt: int, response=None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), delay), self.max_delay)
+            except ValueError:
+                pass  # HTTP-date form: keep the jittered delay
+        return delay
+
+    def _record(self, breaker: CircuitBreaker, ok: bool, kind: str, name: str):
+        call = getattr(self.local, 'call', None)
+        if ok:
+            breaker.record_success()
+            if call is not None:
+                call.succeeded += 1
+        else:
+            if breaker.record_failure():
+                metrics.inc('circuit_opened_total', kind=kind, target=name)
+                print(f"Circuit open for {kind} {name}: failing fast for {self.cooldown:.0f}s")
+            if call is not None:
+                call.failed += 1
+
+    def request(self, url: str, send: Callable, retries: Optional[int] = None):
+        """
+        Call send() (one attempt, returning a response) with retries and the
+        host's breaker. Raises CircuitOpenError while the host's breaker is open.
+        """
+        host = urlparse(url).hostname or ''
+        breaker = self.breaker('host', host)
+        retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.inc('circuit_rejected_total', kind='host', target=host)
+                call = getattr(self.local, 'call', None)
+                if call is not None:
+                    call.failed += 1
+                raise CircuitOpenError(f"Circuit open for {host}")
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(breaker, False, 'host', host)
+                if attempt >= retries:
+                    raise
+                response = None
+            except Exception:
+                breaker.record_success()  # The host answered; the error is ours (bad redirect, decoding)
+                raise
+            else:
+                transient = response.status_code in RETRY_STATUSES
+                self._record(breaker, not transient, 'host', host)
+                if not transient or attempt >= retries:
+                    return response
+            metrics.inc('http_retries_total', host=host)
+            time.sleep(self.backoff(attempt, response))
+            attempt += 1
+
+    @contextmanager
+    def source(self, name: str) -> Iterator[_SourceCall]:
+        """
+        Guard one source call. Raises CircuitOpenError if the source's breaker
+        is open. The call fails if it raises or if every request it made
+        (on this thread) failed; it succeeds if any request got through.
+        """
+        breaker = self.breaker('source', name)
+        if not breaker.allow():
+            metrics.inc('circuit_rejected_total', kind='source', target=name)
+            raise CircuitOpenError(f"Circuit open for source {name}")
+
+        call = _SourceCall()
+        outer = getattr(self.local, 'call', None)
+        self.local.call = call
+        try:
+            yield call
+        except Exception:
+            self._record(breaker, False, 'source', name)
+            raise
+        else:
+            if call.all_failed:
+                self._record(breaker, False, 'source', name)
+            elif call.succeeded:
+                self._record(breaker, True, 'source', name)
+            elif breaker.trial_running:
+                breaker.record_success()  # Trial made no requests (e.g. answered from cache)
+        finally:
+            self.local.call = outer
+
+
+# Process-wide breakers so every collector sees the same dead hosts and sources
+shared_resilience = Resilience()